@@ -23,6 +23,16 @@ interface ChatInterfaceProps {
   onVideoDataRefresh: (fetchVideos: () => Promise<void>) => void;
 }
 
+interface Job {
+  id: string;
+  status: "queued" | "running" | "completed" | "failed";
+  stage?: string;
+  result?: { text: Message; video_response?: VideoData };
+  error?: unknown;
+}
+
+const JOB_POLL_INTERVAL_MS = 1500;
+
 function extractCodeAndExplanation(input: string): {
   code: string;
   explanation: string;
@@ -141,6 +151,30 @@ export const ChatInterface = ({
     }
   }, [fetchMessages, fetchVideos, loading, token]);
 
+  const waitForJob = useCallback(
+    async (jobId: string): Promise<Job> => {
+      while (true) {
+        const res = await fetch(`http://localhost:8000/api/jobs/${jobId}`, {
+          method: "GET",
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
+        });
+        if (!res.ok) {
+          throw new Error("Failed to fetch job status");
+        }
+        const job: Job = await res.json();
+        if (job.status === "completed" || job.status === "failed") {
+          return job;
+        }
+        await new Promise((resolve) =>
+          setTimeout(resolve, JOB_POLL_INTERVAL_MS)
+        );
+      }
+    },
+    [token]
+  );
+
   // Pass the fetchVideos function to parent component
   useEffect(() => {
     onVideoDataRefresh(fetchVideos);
@@ -195,7 +229,20 @@ export const ChatInterface = ({
         return;
       }
 
-      const { text, video_response } = await res.json();
+      const job = await waitForJob((await res.json()).id);
+      if (job.status === "failed" || !job.result) {
+        toast({
+          title: "Error",
+          description: "Failed to generate video.",
+        });
+        // Remove generating status
+        setMessages((prev) =>
+          prev.filter((msg) => msg.id !== "generating-status")
+        );
+        return;
+      }
+
+      const { text, video_response } = job.result;
 
       if (video_response && video_response.video_url) {
         setVideoData((prev) => [video_response, ...prev]);
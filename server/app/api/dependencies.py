@@ -1,22 +1,39 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import verify_token
-from app.crud.user import get_user_by_username
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import verify_token_claims
+from app.crud.aio.user import get_user, get_user_by_username
 from app.models.user import User
+from app.service.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = verify_token(token, credentials_exception)
-    user = get_user_by_username(db, username=username)
+    claims = verify_token_claims(token, credentials_exception)
+    username, user_id = claims["sub"], claims.get("uid")
+    if user_cache is not None:
+        user = user_cache.get(username, user_id)
+        if user is not None and user.username == username:
+            return user
+
+    if user_id is not None:
+        user = await get_user(db, user_id=user_id)
+        if user is not None and user.username != username:
+            user = None
+    else:
+        user = await get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
+
+    if user_cache is not None:
+        # Detach it, since the cached row outlives this request's session
+        db.expunge(user)
+        user_cache.put(user, username, user_id)
     return user
 
@@ -4,12 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.security import create_access_token
+from app.core.security import create_access_token, user_token_claims
 from app.core.config import settings
 from app.crud.user import authenticate_user, get_user_by_oauth_id, create_oauth_user, get_user_by_email, update_user_refresh_token
 from app.schemas.user import Token, User, GoogleAuthRequest
 from app.api.dependencies import get_current_user
 from app.service.google_oauth import google_oauth_service
+from app.service.user_cache import user_cache
 
 router = APIRouter()
 
@@ -27,7 +28,7 @@ def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=user_token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -83,6 +84,8 @@ async def google_auth(
                     existing_user.refresh_token = token_data["refresh_token"]
                 db.commit()
                 db.refresh(existing_user)
+                if user_cache is not None:
+                    user_cache.invalidate(existing_user)
                 user = existing_user
             else:
                 # Create new user
@@ -98,7 +101,7 @@ async def google_auth(
         # Create JWT token
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
         jwt_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data=user_token_claims(user), expires_delta=access_token_expires
         )
 
         return {"access_token": jwt_token, "token_type": "bearer"}
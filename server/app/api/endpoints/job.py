@@ -0,0 +1,55 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.api.dependencies import get_current_user
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.job import Job
+from app.service.jobs import job_queue, FINISHED_STATUSES
+
+router = APIRouter()
+
+
+def _get_job_for_user(job_id: str, current_user: User) -> Job:
+    if job_queue.get_owner(job_id) != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}", response_model=Job)
+def get_job_endpoint(job_id: str, current_user: User = Depends(get_current_user)):
+    return _get_job_for_user(job_id, current_user)
+
+
+@router.get("/{job_id}/events")
+async def job_events_endpoint(job_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    """Server-sent events with the job state, sent whenever it changes until the job finishes."""
+    job = await run_in_threadpool(_get_job_for_user, job_id, current_user)
+
+    async def event_stream(job: Job):
+        last_sent = None
+        while True:
+            data = job.model_dump_json()
+            if data != last_sent:
+                yield f"event: {job.status}\ndata: {data}\n\n"
+                last_sent = data
+            if job.status in FINISHED_STATUSES or await request.is_disconnected():
+                break
+            await asyncio.sleep(settings.job_poll_interval)
+            job = await run_in_threadpool(job_queue.get, job_id)
+            if job is None:
+                # Pruned or deleted while the stream was open
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                break
+
+    return StreamingResponse(
+        event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,19 +1,22 @@
 import math
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.user import User
-from app.crud.video import get_video, update_video
+from app.crud.aio.video import get_video, update_video
 from app.api.dependencies import get_current_user
-from app.pipeline.llm import LLMService
-from app.core.config import settings
+from app.pipeline.llm import llm_service, TTS_SAMPLE_RATE, TTS_SAMPLE_WIDTH
 from app.schemas.video import Video, VideoCreate
-from app.crud.message import get_message
+from app.crud.aio.message import get_message
 from app.service.merger import VideoAudioMerger
 from app.service.upload import S3UploadService
+from app.service.render_cache import render_cache
+from app.service.range_cache import range_cache
+from app.service.source_cache import source_video_cache
+from app.core.config import settings
 from pathlib import Path
 from pydantic import BaseModel
-import subprocess
 
 
 # Response schema
@@ -25,14 +28,10 @@ class MergeAudioResponse(BaseModel):
 
 router = APIRouter()
 
-llm_service = LLMService(
-    api_key=settings.llm_api_key,
-)
-
 upload_service = S3UploadService()
 
 @router.post("/", response_model=MergeAudioResponse)
-def merge_audio_endpoint(videoData: Video, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def merge_audio_endpoint(videoData: Video, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
 
     video_id = videoData.id
     if not video_id:
@@ -46,7 +45,7 @@ def merge_audio_endpoint(videoData: Video, db: Session = Depends(get_db), curren
     if not message_id:
         raise HTTPException(status_code=400, detail="Message ID is required")
 
-    message = get_message(db=db, message_id=message_id)
+    message = await get_message(db=db, message_id=message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
 
@@ -54,34 +53,49 @@ def merge_audio_endpoint(videoData: Video, db: Session = Depends(get_db), curren
     if not s3_url:
         raise HTTPException(status_code=400, detail="Video URL is required")
 
-    video = get_video(db=db, video_id=video_id)
+    video = await get_video(db=db, video_id=video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
     try:
-        fileName = llm_service.generate_speech_from_text(script)
-        filePath = Path.cwd() / 'audios' / fileName
-        output_path = VideoAudioMerger.merge_video_with_audio(
-            s3_video_url=s3_url,
-            audio_file_path=str(filePath),
-        )
-        result = subprocess.run([
-                    'ffprobe', '-v', 'quiet', '-show_entries',
-                    'format=duration', '-of', 'csv=p=0', str(output_path)
-                ], capture_output=True, text=True)
-        duration = float(result.stdout.strip())
-        updated_video_url = upload_service.update_video_from_path(s3_url=s3_url, video_path=output_path)
+        audio_pcm = await llm_service.generate_speech_from_text(script)
+        if settings.merge_streaming_enabled:
+            output_path = None
+            updated_video_url, duration = await run_in_threadpool(
+                VideoAudioMerger.merge_and_upload,
+                s3_video_url=s3_url,
+                audio_pcm=audio_pcm,
+                upload_service=upload_service,
+                sample_rate=TTS_SAMPLE_RATE,
+                sample_width=TTS_SAMPLE_WIDTH,
+            )
+        else:
+            output_path, duration = await run_in_threadpool(
+                VideoAudioMerger.merge_video_with_audio,
+                s3_video_url=s3_url,
+                audio_pcm=audio_pcm,
+                sample_rate=TTS_SAMPLE_RATE,
+                sample_width=TTS_SAMPLE_WIDTH,
+            )
+            updated_video_url = await run_in_threadpool(upload_service.update_video_from_path, s3_url=s3_url, video_path=output_path)
+        if source_video_cache is not None:
+            source_video_cache.invalidate(s3_url)
+        if render_cache is not None:
+            render_cache.invalidate_url(s3_url)
+        if range_cache is not None:
+            range_cache.invalidate(*upload_service.parse_s3_url(s3_url))
         generated_video = VideoCreate(
                     chat_id=message.chat_id,
                     video_url=updated_video_url,
                     message_id=message.id,
                     duration=math.ceil(duration) or 0,
                 )
-        update_video(db=db, video_id=video_id, video=generated_video)
+        await update_video(db=db, video_id=video_id, video=generated_video)
 
-        output_path = Path.cwd() / str(output_path)
-        if output_path.exists():
-            output_path.unlink()
+        if output_path is not None:
+            output_path = Path.cwd() / str(output_path)
+            if output_path.exists():
+                output_path.unlink()
         return MergeAudioResponse(success=True, video_url=updated_video_url, chat_id=message.chat_id, message_id=message.id)
 
     except Exception as e:
@@ -1,11 +1,16 @@
 from fastapi import  HTTPException, Request, APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from botocore.exceptions import NoCredentialsError, ClientError
 import re
 from typing import Optional
 
+from app.core.config import settings
+from app.core.security import get_token_subject
+from app.core.streaming import iterate_with_prefetch
 from app.service.upload import S3UploadService
-from app.service.upload import S3UploadService
+from app.service.range_cache import range_cache
+from app.service.presign import presigned_url_cache
 
 upload_service = S3UploadService()
 
@@ -18,7 +23,7 @@ def stream_s3_file(bucket: str, key: str, start: int = 0, end: Optional[int] = N
             response = upload_service.s3.get_object(Bucket=bucket, Key=key, Range=range_header)
         else:
             response = upload_service.s3.get_object(Bucket=bucket, Key=key)
-        chunk_size = 8192
+        chunk_size = settings.stream_read_size
         body = response['Body']
         try:
             while True:
@@ -33,11 +38,45 @@ def stream_s3_file(bucket: str, key: str, start: int = 0, end: Optional[int] = N
     except NoCredentialsError:
         raise HTTPException(status_code=500, detail="AWS credentials not found")
 
+def read_range(bucket: str, key: str, start: int, end: int):
+    if range_cache is not None:
+        chunks = range_cache.iter_range(bucket, key, start, end)
+    else:
+        chunks = stream_s3_file(bucket, key, start, end)
+    return iterate_with_prefetch(chunks, settings.stream_prefetch_chunks)
+
+DELIVERY_MODES = ("redirect", "presign", "proxy")
+
+def _request_subject(request: Request, token: Optional[str]) -> Optional[str]:
+    if token is None:
+        authorization = request.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    return get_token_subject(token)
+
+def presigned_response(mode: str, bucket: str, key: str, subject: Optional[str]):
+    url, max_age = presigned_url_cache.get(bucket, key, subject)
+    if mode == "presign":
+        return JSONResponse({"url": url, "expires_in": max_age})
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": f"private, max-age={max_age}"})
+
 @router.get("/stream-video")
-async def stream_video(request: Request, s3_url: str):
+async def stream_video(request: Request, s3_url: str, mode: Optional[str] = None, token: Optional[str] = None):
+    """Deliver a video by presigned redirect or JSON URL, or by proxying byte ranges as a fallback."""
+    mode = mode or settings.video_delivery_mode
+    if mode not in DELIVERY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown delivery mode: {mode}")
     try:
         bucket, key = upload_service.parse_s3_url(s3_url)
-        file_size = upload_service.get_file_size(bucket, key)
+        if mode != "proxy":
+            try:
+                return presigned_response(mode, bucket, key, _request_subject(request, token))
+            except RuntimeError as e:
+                print(f"Warning: Presigning failed, proxying instead: {e}")
+        if range_cache is not None:
+            file_size = (await run_in_threadpool(range_cache.head, bucket, key))["size"]
+        else:
+            file_size = await run_in_threadpool(upload_service.get_file_size, bucket, key)
         range_header = request.headers.get('range')
 
         if range_header:
@@ -56,7 +95,7 @@ async def stream_video(request: Request, s3_url: str):
                 }
 
                 return StreamingResponse(
-                    stream_s3_file(bucket, key, start, end),
+                    read_range(bucket, key, start, end),
                     status_code=206,
                     headers=headers,
                     media_type='video/mp4'
@@ -69,11 +108,13 @@ async def stream_video(request: Request, s3_url: str):
         }
 
         return StreamingResponse(
-            stream_s3_file(bucket, key),
+            read_range(bucket, key, 0, file_size - 1),
             headers=headers,
             media_type='video/mp4'
         )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,16 +1,15 @@
-
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.schemas.user import UserCreate, UserUpdate, User
-from app.crud.user import  get_user_by_username, create_user
+from app.crud.aio.user import  get_user_by_username, create_user
 
 router = APIRouter()
 
 @router.post("/", response_model=User)
-def create_user_endpoint(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user_by_username(db, username=user.username)
+async def create_user_endpoint(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return create_user(db=db, user=user)
+    return await create_user(db=db, user=user)
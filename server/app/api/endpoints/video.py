@@ -1,10 +1,11 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 
 from app.schemas.video import Video
-from app.crud.video import   get_videos_by_chat_id
+from app.crud.aio.video import   get_videos_by_chat_id, get_videos_page
 
 from app.models.user import User
 from app.api.dependencies import get_current_user
@@ -14,9 +15,21 @@ router = APIRouter()
 
 
 @router.get("/chat/{chat_id}", response_model=list[Video])
-def get_videos_by_chat_id_endpoint(chat_id: int,
-                                  db: Session = Depends(get_db),
-                                  current_user: User = Depends(get_current_user)):
-    videos = get_videos_by_chat_id(db=db, chat_id=chat_id)
+async def get_videos_by_chat_id_endpoint(chat_id: int,
+                                         response: Response,
+                                         limit: Optional[int] = Query(None, ge=1, le=500),
+                                         cursor: Optional[str] = None,
+                                         db: AsyncSession = Depends(get_async_db),
+                                         current_user: User = Depends(get_current_user)):
+    """All videos newest first, or one page of `limit` with the next page's cursor in X-Next-Cursor."""
+    if limit is None:
+        videos = await get_videos_by_chat_id(db=db, chat_id=chat_id)
+    else:
+        try:
+            videos, next_cursor = await get_videos_page(db=db, chat_id=chat_id, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
     print(f"Retrieved {len(videos)} videos for chat_id {chat_id}")
     return videos
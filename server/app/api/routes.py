@@ -7,6 +7,7 @@ from app.api.endpoints import stream
 from app.api.endpoints import video
 from app.api.endpoints import generate_script
 from app.api.endpoints import merge_audio
+from app.api.endpoints import job
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -16,5 +17,6 @@ api_router.include_router(message.router, prefix="/messages", tags=["messages"])
 api_router.include_router(video.router, prefix="/videos", tags=["videos"])
 api_router.include_router(generate_script.router, prefix="/generate-script", tags=["generate_script"])
 api_router.include_router(merge_audio.router, prefix="/merge-audio", tags=["merge_audio"])
+api_router.include_router(job.router, prefix="/jobs", tags=["jobs"])
 #
 api_router.include_router(stream.router, prefix="", tags=["stream"])
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with optional per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the live entries, oldest first; does not touch LRU order or counters."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, expires_at) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DiskLRUCache:
+    """
+    Thread-safe LRU cache of byte blobs stored as files, bounded by total size.
+
+    Keys are hashed into file names, so any string works as a key. The index
+    is rebuilt from the directory on start, oldest mtime first.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        for path in sorted(self.directory.glob("*.bin"), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._index[path.stem] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{name}.bin"
+
+    def path(self, key: str) -> Optional[Path]:
+        """Path of a cached entry, counted as a hit; the file may be evicted at any time after."""
+        name = self._name(key)
+        with self._lock:
+            if name not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(name)
+            self.hits += 1
+        return self._path(name)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            self.pop(key)
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        name = self._name(key)
+        temp_path = self.directory / f".{name}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._path(name))
+        with self._lock:
+            self._bytes += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self._evict()
+
+    def set_file(self, key: str, source: Path) -> None:
+        """Copy a file into the cache without reading it into memory."""
+        name = self._name(key)
+        temp_path = self.directory / f".{name}.{threading.get_ident()}.tmp"
+        shutil.copyfile(source, temp_path)
+        size = temp_path.stat().st_size
+        os.replace(temp_path, self._path(name))
+        with self._lock:
+            self._bytes += size - self._index.pop(name, 0)
+            self._index[name] = size
+            self._evict()
+
+    def pop(self, key: str) -> None:
+        name = self._name(key)
+        with self._lock:
+            size = self._index.pop(name, None)
+            if size is None:
+                return
+            self._bytes -= size
+        self._path(name).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._path(name).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
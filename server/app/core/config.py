@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 
 class Settings(BaseSettings):
@@ -9,6 +9,9 @@ class Settings(BaseSettings):
     environment: str = "development"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440
+    token_embed_user_id: bool = True  # "uid" claim, so the user is fetched by primary key
+    user_cache_ttl_seconds: float = 60  # 0 disables the authenticated user cache
+    user_cache_max_entries: int = 10000
 
     # Required settings - no defaults (will raise error if not in .env)
     database_url: str
@@ -17,21 +20,103 @@ class Settings(BaseSettings):
 
     # Optional settings with defaults
     llm_base_url: str = "https://generativelanguage.googleapis.com/v1beta/openai/"
+    llm_max_concurrency: int = 8
+    llm_requests_per_minute: int = 60  # 0 disables rate limiting
+    llm_max_connections: int = 20
+    llm_timeout: float = 120.0
+
+    # Narration TTS: scripts are split into sentence chunks synthesized concurrently
+    tts_chunk_max_chars: int = 600
+    tts_max_parallel: int = 4
+    tts_chunk_gap_ms: int = 250
+    tts_cache_enabled: bool = True
+    tts_cache_dir: Path = Path("./cache/tts")
+    tts_cache_max_bytes: int = 512 * 1024 * 1024
 
     # Google OAuth settings
     google_client_id: Optional[str] = None
     google_client_secret: Optional[str] = None
     google_redirect_uri: str = "http://localhost:8080/auth/callback"
 
+    # Async engine used by the request handlers (asyncpg / aiosqlite)
+    async_db_pool_size: int = 20
+    async_db_max_overflow: int = 20
+
     # Path and config settings with defaults
     scripts_dir: Path = Path("./scripts")  # More portable default
-    manim_quality: str = "720p30"
+    manim_quality: str = "720p30"  # final quality: 480p15, 720p30, 1080p60, 1440p60 or 2160p60
+    preview_quality: Optional[str] = "480p15"  # rendered first and replaced in the background; None renders final quality only
+    final_render_workers: int = 1
+    final_render_queue_size: int = 8  # upgrades queued or running at most; further previews stay as they are
     manim_timeout: int = 300
+    manim_allowed_imports: List[str] = [
+        "manim", "math", "numpy", "random", "itertools", "functools",
+        "collections", "typing", "colour", "string", "__future__",
+    ]
+    manim_dry_run_enabled: bool = False  # construct() dry run in a warm worker before rendering
+    manim_parallel_sections: int = 1  # >1 splits long scenes into that many animation ranges rendered in parallel
+    manim_section_min_animations: int = 4  # animations per section at least; shorter scenes render in one pass
+    speculative_candidates: int = 1  # >1 renders that many code candidates at once and keeps the first success
+    speculative_global_limit: int = 2  # extra candidates in flight across the server
+    speculative_per_user_limit: int = 1  # extra candidates in flight per user
     max_video_size_mb: float = 50.0
 
     docker_image: str = "manimcommunity/manim"
     docker_timeout: int = 30
 
+    # Warm render worker pool (falls back to `docker run --rm` per render when disabled)
+    render_pool_enabled: bool = False
+    render_pool_backend: str = "docker"  # "docker" or "subprocess"
+    render_pool_size: int = 2
+    render_pool_max_jobs_per_worker: int = 50
+    render_pool_health_check_interval: int = 30
+
+    # Render cache keyed on normalized Manim source
+    render_cache_enabled: bool = True
+    render_cache_max_entries: int = 512
+    render_cache_ttl_seconds: int = 7 * 24 * 3600
+
+    # Local block cache for /stream-video range requests
+    stream_cache_enabled: bool = True
+    stream_cache_dir: Path = Path("./cache/stream")
+    stream_cache_max_bytes: int = 1024 * 1024 * 1024
+    stream_cache_block_size: int = 1024 * 1024
+    stream_read_size: int = 4 * 1024 * 1024  # bytes fetched from S3 per cold read
+    stream_head_ttl_seconds: int = 60
+    stream_prefetch_chunks: int = 4  # chunks buffered ahead of a slow client
+
+    # How /stream-video delivers bytes: "redirect" (302 to a presigned URL),
+    # "presign" (JSON with the presigned URL) or "proxy" (stream through the API)
+    video_delivery_mode: str = "redirect"
+    presign_expires_seconds: int = 900
+    presign_refresh_margin_seconds: int = 120
+
+    # Audio merge: stream source -> ffmpeg -> S3 instead of download, merge, upload
+    merge_streaming_enabled: bool = True
+    merge_pad_strategy: str = "concat"  # "concat" (copy + freeze-frame tail) or "tpad" (full re-encode)
+    merge_x264_preset: str = "veryfast"
+    merge_x264_threads: int = 0  # 0 lets x264 decide
+    source_cache_enabled: bool = True
+    source_cache_dir: Path = Path("./cache/source")
+    source_cache_max_bytes: int = 1024 * 1024 * 1024
+
+    # First-turn LLM response cache
+    llm_cache_backend: str = "memory"  # "memory", "disk" or "none"
+    llm_cache_dir: Path = Path("./cache/llm")
+    llm_cache_max_entries: int = 1000
+    llm_cache_ttl_seconds: int = 24 * 3600
+    llm_cache_similarity_threshold: Optional[float] = None  # e.g. 0.8 to reuse code for rephrased prompts
+
+    # Prompt context
+    context_token_budget: int = 16000  # estimated prompt tokens per code generation, system preamble included
+    context_recent_turns: int = 3  # user turns replayed verbatim; older ones are folded into the chat summary
+
+    # Background generation jobs
+    job_queue_backend: str = "memory"  # "memory" or "database"
+    job_workers: int = 4
+    job_poll_interval: float = 0.5
+    job_lease_seconds: int = 120  # a running job not refreshed for this long is failed (its worker died)
+
     # S3 settings with defaults
     s3_bucket_name: str = "my-default-bucket"
     s3_region: str = "us-east-1"
@@ -1,4 +1,7 @@
+from contextlib import contextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
@@ -23,9 +26,58 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async drivers for request handlers, so DB waits don't hold threadpool threads
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+if settings.database_url.startswith("sqlite"):
+    async_engine = create_async_engine(async_database_url(settings.database_url))
+else:
+    async_engine = create_async_engine(
+        async_database_url(settings.database_url),
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_size=settings.async_db_pool_size,
+        max_overflow=settings.async_db_max_overflow,
+    )
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def ensure_indexes():
+    """Create indexes added to the models after their tables already existed; create_all skips those."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+@contextmanager
+def unit_of_work():
+    """One session and one transaction: flush for ids inside, a single commit on success, rollback on error."""
+    with SessionLocal() as db:
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def warm_async_engine():
+    """Open one connection so dialect initialization runs once, before concurrent requests race for it."""
+    async with async_engine.connect():
+        pass
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
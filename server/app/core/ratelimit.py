@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class AsyncTokenBucket:
+    """Token bucket for asyncio callers; `acquire` waits until a token is available."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate_per_second)
+
+
+class PriorityGate:
+    """
+    Lets background work wait until no foreground work is in flight.
+
+    Foreground callers hold `foreground()` while they run; background callers
+    call `wait_for_idle()` before starting, so they only use spare capacity.
+    """
+
+    def __init__(self):
+        self._active = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def foreground(self):
+        with self._condition:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if self._active == 0:
+                    self._condition.notify_all()
+
+    def wait_for_idle(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._active == 0)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"foreground": self._active}
+
+
+class ConcurrencyBudget:
+    """
+    Non-blocking slot counter with a global cap and a cap per key (e.g. user).
+
+    `try_acquire` grants as many slots as are free right now, possibly zero,
+    so optional work shrinks under load instead of queueing behind it.
+    """
+
+    def __init__(self, global_limit: int, per_key_limit: int):
+        self.global_limit = global_limit
+        self.per_key_limit = per_key_limit
+        self._in_use = 0
+        self._per_key: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, count: int) -> int:
+        with self._lock:
+            held = self._per_key.get(key, 0)
+            granted = max(0, min(count, self.global_limit - self._in_use, self.per_key_limit - held))
+            if granted:
+                self._in_use += granted
+                self._per_key[key] = held + granted
+            return granted
+
+    def release(self, key: str, count: int) -> None:
+        if count <= 0:
+            return
+        with self._lock:
+            self._in_use -= count
+            held = self._per_key.get(key, 0) - count
+            if held > 0:
+                self._per_key[key] = held
+            else:
+                self._per_key.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_use": self._in_use, "global_limit": self.global_limit, "keys": len(self._per_key)}
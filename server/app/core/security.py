@@ -22,12 +22,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception):
+def user_token_claims(user) -> dict:
+    claims = {"sub": user.username}
+    if settings.token_embed_user_id:
+        claims["uid"] = user.id
+    return claims
+
+def verify_token_claims(token: str, credentials_exception) -> dict:
+    """Decoded payload of a valid token that has a subject."""
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        return email
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+def verify_token(token: str, credentials_exception):
+    return verify_token_claims(token, credentials_exception)["sub"]
+
+def get_token_subject(token: Optional[str]) -> Optional[str]:
+    """Subject of a valid token, or None; no database lookup."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        return payload.get("sub")
+    except JWTError:
+        return None
@@ -0,0 +1,45 @@
+import asyncio
+from contextlib import suppress
+from typing import AsyncIterator, Iterator
+
+from fastapi.concurrency import run_in_threadpool
+
+_DONE = object()
+
+
+async def iterate_with_prefetch(iterator: Iterator[bytes], max_chunks: int = 4) -> AsyncIterator[bytes]:
+    """
+    Drive a blocking iterator from worker threads without stalling the event loop.
+
+    A producer task keeps at most `max_chunks` chunks buffered ahead of the
+    consumer, so a slow client applies backpressure all the way to S3.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_chunks)
+
+    async def produce() -> None:
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, iterator, _DONE)
+                await queue.put(chunk)
+                if chunk is _DONE:
+                    return
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        # Thread calls are not abandoned on cancel, so this waits for any in-flight read before closing
+        with suppress(asyncio.CancelledError):
+            await producer
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await run_in_threadpool(close)
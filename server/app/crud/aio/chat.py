@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from app.models.chat import Chat
+from app.schemas.chat import ChatCreate
+
+
+async def get_chat(db: AsyncSession, chat_id: int) -> Optional[Chat]:
+    return await db.get(Chat, chat_id)
+
+async def get_chats_by_user_id(db: AsyncSession, user_id: int) -> List[Chat]:
+    result = await db.scalars(select(Chat).where(Chat.user_id == user_id))
+    return list(result)
+
+async def create_chat(db: AsyncSession, chat: ChatCreate, user_id: int) -> Chat:
+    db_chat = Chat(
+        title=chat.title,
+        user_id=user_id,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+    db.add(db_chat)
+    await db.commit()
+    return db_chat
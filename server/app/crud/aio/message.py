@@ -0,0 +1,38 @@
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Tuple
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.models.message import Message
+
+
+async def get_message(db: AsyncSession, message_id: int) -> Optional[Message]:
+    return await db.get(Message, message_id)
+
+async def get_messages_by_chat_id(db: AsyncSession, chat_id: int) -> List[Message]:
+    result = await db.scalars(
+        select(Message)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.created_at, Message.id)
+    )
+    return list(result)
+
+async def get_messages_page(db: AsyncSession, chat_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Message], Optional[str]]:
+    """Oldest first, `limit` messages after `cursor`; returns the page and the cursor of the next one."""
+    query = select(Message).where(Message.chat_id == chat_id)
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.where(tuple_(Message.created_at, Message.id) > tuple_(created_at, message_id))
+    messages = list(await db.scalars(query.order_by(Message.created_at, Message.id).limit(limit + 1)))
+    if len(messages) <= limit:
+        return messages, None
+    messages = messages[:limit]
+    return messages, encode_cursor(messages[-1].created_at, messages[-1].id)
+
+async def delete_message(db: AsyncSession, message_id: int) -> Optional[Message]:
+    db_message = await get_message(db, message_id)
+    if not db_message:
+        return None
+
+    await db.delete(db_message)
+    await db.commit()
+    return db_message
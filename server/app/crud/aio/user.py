@@ -0,0 +1,28 @@
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.core.security import get_password_hash
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.username == username).limit(1))
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    # bcrypt is deliberately slow; keep it off the event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
+    db_user = User(
+        username = user.username,
+        hashed_password = hashed_password,
+        created_at = datetime.utcnow(),
+        updated_at = datetime.utcnow()
+    )
+    db.add(db_user)
+    await db.commit()
+    return db_user
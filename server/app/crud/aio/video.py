@@ -0,0 +1,41 @@
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Tuple
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.models.video import Video
+from app.schemas.video import VideoCreate
+
+
+async def get_video(db: AsyncSession, video_id: int) -> Optional[Video]:
+    return await db.get(Video, video_id)
+
+async def get_videos_by_chat_id(db: AsyncSession, chat_id: int) -> List[Video]:
+    result = await db.scalars(
+        select(Video)
+        .where(Video.chat_id == chat_id)
+        .order_by(Video.updated_at.desc(), Video.id.desc())
+    )
+    return list(result)
+
+async def get_videos_page(db: AsyncSession, chat_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Video], Optional[str]]:
+    """Most recently updated first, `limit` videos after `cursor`; returns the page and the cursor of the next one."""
+    query = select(Video).where(Video.chat_id == chat_id)
+    if cursor:
+        updated_at, video_id = decode_cursor(cursor)
+        query = query.where(tuple_(Video.updated_at, Video.id) < tuple_(updated_at, video_id))
+    videos = list(await db.scalars(query.order_by(Video.updated_at.desc(), Video.id.desc()).limit(limit + 1)))
+    if len(videos) <= limit:
+        return videos, None
+    videos = videos[:limit]
+    return videos, encode_cursor(videos[-1].updated_at, videos[-1].id)
+
+async def update_video(db: AsyncSession, video_id: int, video: VideoCreate) -> Optional[Video]:
+    db_video = await get_video(db, video_id)
+    if not db_video:
+        return None
+
+    db_video.video_url = video.video_url
+    db_video.updated_at = datetime.utcnow()
+    await db.commit()
+    return db_video
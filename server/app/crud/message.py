@@ -1,6 +1,8 @@
 from datetime import datetime
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from app.crud.pagination import decode_cursor, encode_cursor
 from app.models.message import Message
 from app.schemas.message import MessageCreate
 
@@ -9,9 +11,27 @@ def get_message(db: Session, message_id: int) -> Optional[Message]:
     return db.query(Message).filter(Message.id == message_id).first()
 
 def get_messages_by_chat_id(db: Session, chat_id: int) -> List[Message]:
-    return db.query(Message).filter(Message.chat_id == chat_id).all()
+    return (
+        db.query(Message)
+        .filter(Message.chat_id == chat_id)
+        .order_by(Message.created_at, Message.id)
+        .all()
+    )
+
+def get_messages_page(db: Session, chat_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Message], Optional[str]]:
+    """Oldest first, `limit` messages after `cursor`; returns the page and the cursor of the next one."""
+    query = db.query(Message).filter(Message.chat_id == chat_id)
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Message.created_at, Message.id) > tuple_(created_at, message_id))
+    messages = query.order_by(Message.created_at, Message.id).limit(limit + 1).all()
+    if len(messages) <= limit:
+        return messages, None
+    messages = messages[:limit]
+    return messages, encode_cursor(messages[-1].created_at, messages[-1].id)
 
-def create_message(db: Session, message: MessageCreate) -> Message:
+def create_message(db: Session, message: MessageCreate, commit: bool = True) -> Message:
+    """With commit=False the row is only flushed, for callers that commit a larger unit of work."""
     db_message = Message(
         content=message.content,
         role=message.role,
@@ -20,8 +40,11 @@ def create_message(db: Session, message: MessageCreate) -> Message:
         updated_at=datetime.utcnow()
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    if commit:
+        db.commit()
+        db.refresh(db_message)
+    else:
+        db.flush()
     return db_message
 
 def update_message(db: Session, message_id: int, message: MessageCreate) -> Optional[Message]:
@@ -7,8 +7,13 @@ from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
 from app.core.security import verify_password
+from app.service.user_cache import user_cache
 
 
+def _invalidate_cached(user: User) -> None:
+    if user_cache is not None:
+        user_cache.invalidate(user)
+
 def get_user(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
@@ -59,6 +64,7 @@ def update_user_refresh_token(db: Session, user_id: int, refresh_token: str) ->
     db_user.refresh_token = refresh_token
     db_user.updated_at = datetime.utcnow()
     db.commit()
+    _invalidate_cached(db_user)
     db.refresh(db_user)
     return db_user
 
@@ -67,6 +73,8 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
     if not db_user:
         return None
 
+    # Drop the entries under the old username before it changes
+    _invalidate_cached(db_user)
     if user_update.username is not None:
         db_user.username = user_update.username
     if user_update.password is not None:
@@ -74,6 +82,7 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
 
     db.commit()
     db.refresh(db_user)
+    _invalidate_cached(db_user)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> Optional[User]:
@@ -83,6 +92,7 @@ def delete_user(db: Session, user_id: int) -> Optional[User]:
 
     db.delete(db_user)
     db.commit()
+    _invalidate_cached(db_user)
     return db_user
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
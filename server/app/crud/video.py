@@ -1,6 +1,8 @@
 from datetime import datetime
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from app.crud.pagination import decode_cursor, encode_cursor
 from app.models.video import Video
 from app.schemas.video import VideoCreate
 
@@ -9,9 +11,22 @@ def get_video(db: Session, video_id: int) -> Optional[Video]:
     return db.query(Video).filter(Video.id == video_id).first()
 
 def get_videos_by_chat_id(db: Session, chat_id: int) -> List[Video]:
-  return db.query(Video).filter(Video.chat_id == chat_id).order_by(Video.updated_at.desc()).all()
+  return db.query(Video).filter(Video.chat_id == chat_id).order_by(Video.updated_at.desc(), Video.id.desc()).all()
 
-def create_video(db: Session, video: VideoCreate) -> Video:
+def get_videos_page(db: Session, chat_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Video], Optional[str]]:
+    """Most recently updated first, `limit` videos after `cursor`; returns the page and the cursor of the next one."""
+    query = db.query(Video).filter(Video.chat_id == chat_id)
+    if cursor:
+        updated_at, video_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Video.updated_at, Video.id) < tuple_(updated_at, video_id))
+    videos = query.order_by(Video.updated_at.desc(), Video.id.desc()).limit(limit + 1).all()
+    if len(videos) <= limit:
+        return videos, None
+    videos = videos[:limit]
+    return videos, encode_cursor(videos[-1].updated_at, videos[-1].id)
+
+def create_video(db: Session, video: VideoCreate, commit: bool = True) -> Video:
+    """With commit=False the row is only flushed, for callers that commit a larger unit of work."""
     db_video = Video(
         chat_id=video.chat_id,
         video_url=video.video_url,
@@ -22,8 +37,11 @@ def create_video(db: Session, video: VideoCreate) -> Video:
     )
 
     db.add(db_video)
-    db.commit()
-    db.refresh(db_video)
+    if commit:
+        db.commit()
+        db.refresh(db_video)
+    else:
+        db.flush()
     return db_video
 
 def update_video(db: Session, video_id: int, video: VideoCreate) -> Optional[Video]:
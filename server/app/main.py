@@ -1,12 +1,23 @@
 # type: ignore
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base, ensure_indexes, warm_async_engine
 from app.api.routes import api_router
 from app.middleware.cors import add_cors_middleware
-from app.models import User, Chat, Message
+from app.models import User, Chat, Message, Job
+from app.service.render_pool import render_pool
+from app.service.jobs import job_runner
+from app.service.render_cache import render_cache
+from app.pipeline.llm_cache import llm_response_cache
+from app.pipeline.llm import llm_service
+from app.service.media_probe import media_probe
+from app.service.range_cache import range_cache
+from app.service.presign import presigned_url_cache
+from app.pipeline.tts_cache import tts_cache
+from app.service.user_cache import user_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,12 +25,29 @@ logging.basicConfig(
 )
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not media_probe.check_binaries():
+        print("Warning: ffmpeg/ffprobe not found; audio merging and duration probing will fail")
+    await warm_async_engine()
+    if render_pool is not None:
+        render_pool.start()
+    job_runner.start()
+    yield
+    await job_runner.stop()
+    await llm_service.aclose()
+    await async_engine.dispose()
+    if render_pool is not None:
+        render_pool.shutdown()
 
 app = FastAPI(
     title=settings.app_name,
     description="Production-ready FastAPI backend with SQLAlchemy",
     version="1.0.0",
     debug=settings.debug,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -33,7 +61,22 @@ app.include_router(api_router, prefix='/api', tags=["api"])
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    health = {"status": "healthy"}
+    if render_pool is not None:
+        health["render_pool"] = render_pool.stats()
+    if render_cache is not None:
+        health["render_cache"] = render_cache.stats()
+    if llm_response_cache is not None:
+        health["llm_cache"] = llm_response_cache.stats()
+    health["media_probe"] = media_probe.stats()
+    if range_cache is not None:
+        health["stream_cache"] = range_cache.stats()
+    health["presigned_urls"] = presigned_url_cache.stats()
+    if tts_cache is not None:
+        health["tts_cache"] = tts_cache.stats()
+    if user_cache is not None:
+        health["user_cache"] = user_cache.stats()
+    return health
 
 @app.get("/")
 async def root():
@@ -1,3 +1,5 @@
 from .user import User
 from .chat import Chat
 from .message import Message
+from .job import Job
+from .chat_summary import ChatSummary
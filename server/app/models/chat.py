@@ -16,3 +16,4 @@ class Chat(Base):
     user = relationship("User", back_populates="chats")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
     videos = relationship("Video", back_populates="chat", cascade="all, delete-orphan")
+    summary = relationship("ChatSummary", back_populates="chat", uselist=False, cascade="all, delete-orphan")
@@ -0,0 +1,17 @@
+from app.core.database import Base
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Text
+from sqlalchemy.orm import relationship
+
+
+class ChatSummary(Base):
+  __tablename__ = "chat_summaries"
+
+  chat_id = Column(Integer, ForeignKey("chats.id"), primary_key=True)
+  summary = Column(Text, nullable=False)
+  # Messages up to and including this id are folded into the summary
+  last_message_id = Column(Integer, nullable=False)
+  # Newest code block among the folded messages, replayed while no newer reply has code
+  latest_code = Column(Text, nullable=True)
+  updated_at = Column(DateTime(timezone=True), nullable=False)
+
+  chat = relationship("Chat", back_populates="summary")
@@ -0,0 +1,17 @@
+from app.core.database import Base
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+
+
+class Job(Base):
+  __tablename__ = "jobs"
+
+  id = Column(String(32), primary_key=True, index=True)
+  kind = Column(String, nullable=False)
+  status = Column(String, nullable=False, index=True)
+  stage = Column(String, nullable=True)
+  payload = Column(JSON, nullable=True)
+  result = Column(JSON, nullable=True)
+  error = Column(JSON, nullable=True)
+  user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+  created_at = Column(DateTime(timezone=True), nullable=False)
+  updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,10 +1,14 @@
 from app.core.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 
 
 class Message(Base):
   __tablename__ = "messages"
+  __table_args__ = (
+    # Chat history in order, and keyset pagination on (created_at, id)
+    Index("ix_messages_chat_id_created_at", "chat_id", "created_at", "id"),
+  )
 
   id = Column(Integer, primary_key=True, index=True)
   content = Column(String, nullable=False)
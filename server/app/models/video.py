@@ -1,17 +1,21 @@
 from app.core.database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 
 
 class Video(Base):
   __tablename__ = "videos"
+  __table_args__ = (
+    # The chat video list is served newest-updated first
+    Index("ix_videos_chat_id_updated_at", "chat_id", "updated_at", "id"),
+  )
 
   id = Column(Integer, primary_key=True, index=True)
   created_at = Column(DateTime(timezone=True), nullable=False)
   updated_at = Column(DateTime(timezone=True), nullable=False)
   video_url = Column(String, nullable=True)
   chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
-  message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+  message_id = Column(Integer, ForeignKey("messages.id"), nullable=False, index=True)
   duration = Column(Integer, nullable=True)
 
   chat = relationship("Chat", back_populates="videos")
@@ -0,0 +1,192 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.chat_summary import ChatSummary
+from app.models.message import Message
+from app.pipeline.llm import PromptSession
+
+CODE_BLOCK_PATTERN = re.compile(r"```python.*?```", re.DOTALL)
+SUPERSEDED_CODE = "```python\n# Earlier version omitted; the latest code appears later in this conversation.\n```"
+SUMMARY_HEADER = "Summary of my earlier requests in this chat (oldest first):"
+SUMMARY_OMITTED = "My earlier requests in this chat are omitted."
+SUMMARY_REPLY = "Understood. I will build on the latest code."
+CARRIED_CODE_REPLY = "Understood. This is the latest code, which I will build on:"
+SUMMARY_LINE_CHARS = 200
+SUMMARY_MAX_LINES = 40
+
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for English prose and Python
+    return len(text) // 4 + 1
+
+
+def _trim(content: str) -> str:
+    text = " ".join(content.split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 3] + "..."
+    return text
+
+
+def _summary_line(content: str) -> str:
+    return f"- {_trim(content)}"
+
+
+def _group_turns(messages: List[Message]) -> List[List[Dict[str, str]]]:
+    """Split messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        entry = {"role": message.role, "content": message.content}
+        if message.role == "user" or not turns:
+            turns.append([entry])
+        else:
+            turns[-1].append(entry)
+    return turns
+
+
+def _latest_code_turn(turns: List[List[Dict[str, str]]]) -> Optional[int]:
+    """Index of the newest turn with a code block in an assistant reply."""
+    for index in range(len(turns) - 1, -1, -1):
+        if any(m["role"] == "assistant" and CODE_BLOCK_PATTERN.search(m["content"]) for m in turns[index]):
+            return index
+    return None
+
+
+def _latest_code_block(turn: List[Dict[str, str]]) -> Optional[str]:
+    for message in reversed(turn):
+        if message["role"] == "assistant":
+            blocks = CODE_BLOCK_PATTERN.findall(message["content"])
+            if blocks:
+                return blocks[-1]
+    return None
+
+
+class ContextWindowManager:
+    """
+    Builds the code-generation prompt for a chat within a token budget.
+
+    The last few user turns are replayed, with only the newest code block kept
+    in full. Older user requests are folded into a short rolling summary that is
+    stored per chat, so each request only reads the messages not summarized yet.
+    The newest code block is never dropped: if it aged out with its turn, it is
+    kept with the summary and replayed after it.
+    """
+
+    def __init__(self, token_budget: int, recent_turns: int):
+        self.token_budget = token_budget
+        self.recent_turns = max(1, recent_turns)
+        self._preamble_tokens = sum(estimate_tokens(m["content"]) for m in PromptSession().get_preamble())
+
+    def build_session(self, db: Session, chat_id: int, exclude_message_id: Optional[int] = None) -> PromptSession:
+        summary = db.query(ChatSummary).filter(ChatSummary.chat_id == chat_id).first()
+        query = db.query(Message).filter(Message.chat_id == chat_id)
+        if summary is not None:
+            query = query.filter(Message.id > summary.last_message_id)
+        if exclude_message_id is not None:
+            query = query.filter(Message.id != exclude_message_id)
+        messages = query.order_by(Message.created_at, Message.id).all()
+
+        turns = _group_turns(messages)
+        user_turn_count = sum(1 for turn in turns if turn[0]["role"] == "user")
+        if user_turn_count > self.recent_turns:
+            keep_from = [i for i, turn in enumerate(turns) if turn[0]["role"] == "user"][-self.recent_turns]
+            aged_count = sum(len(turn) for turn in turns[:keep_from])
+            summary = self._fold(db, chat_id, summary, turns[:keep_from], messages[aged_count - 1].id)
+            turns = turns[keep_from:]
+
+        self._drop_superseded_code(turns)
+        summary_lines = summary.summary.splitlines() if summary is not None else []
+        pinned = _latest_code_turn(turns)
+        # Failed generations leave user-only turns, so the newest code may only be left in the summary
+        carried_code = summary.latest_code if summary is not None and pinned is None else None
+
+        # Over budget even after summarizing: fold the replayed turns older than the latest code in as well,
+        # for this prompt only
+        keep = pinned if pinned is not None else len(turns) - 1
+        while keep > 0 and self._estimate(summary_lines, carried_code, turns) > self.token_budget:
+            oldest = turns.pop(0)
+            keep -= 1
+            if oldest[0]["role"] == "user":
+                summary_lines = (summary_lines + [_summary_line(oldest[0]["content"])])[-SUMMARY_MAX_LINES:]
+        while summary_lines and self._estimate(summary_lines, carried_code, turns) > self.token_budget:
+            summary_lines.pop(0)
+        if self._estimate(summary_lines, carried_code, turns) > self.token_budget:
+            # Only the latest code is left: cut the prose around it, never the code itself
+            self._redact_prose(turns)
+
+        return PromptSession(self._history(summary_lines, carried_code, turns))
+
+    @staticmethod
+    def _history(summary_lines: List[str], carried_code: Optional[str],
+                 turns: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        history = []
+        if summary_lines or carried_code:
+            summary_text = "\n".join([SUMMARY_HEADER, *summary_lines]) if summary_lines else SUMMARY_OMITTED
+            reply = f"{CARRIED_CODE_REPLY}\n{carried_code}" if carried_code else SUMMARY_REPLY
+            history.append({"role": "user", "content": summary_text})
+            history.append({"role": "assistant", "content": reply})
+        for turn in turns:
+            history.extend(turn)
+        return history
+
+    def _estimate(self, summary_lines: List[str], carried_code: Optional[str],
+                  turns: List[List[Dict[str, str]]]) -> int:
+        history = self._history(summary_lines, carried_code, turns)
+        return self._preamble_tokens + sum(estimate_tokens(m["content"]) for m in history)
+
+    @staticmethod
+    def _redact_prose(turns: List[List[Dict[str, str]]]) -> None:
+        """Shorten every replayed message to a trimmed line, keeping assistant code blocks whole."""
+        for turn in turns:
+            for message in turn:
+                blocks = CODE_BLOCK_PATTERN.findall(message["content"]) if message["role"] == "assistant" else []
+                message["content"] = "\n".join(blocks) if blocks else _trim(message["content"])
+
+    @staticmethod
+    def _drop_superseded_code(turns: List[List[Dict[str, str]]]) -> None:
+        latest_seen = False
+        for turn in reversed(turns):
+            for message in reversed(turn):
+                if message["role"] != "assistant" or not CODE_BLOCK_PATTERN.search(message["content"]):
+                    continue
+                if latest_seen:
+                    message["content"] = CODE_BLOCK_PATTERN.sub(SUPERSEDED_CODE, message["content"])
+                latest_seen = True
+
+    @staticmethod
+    def _fold(db: Session, chat_id: int, summary: Optional[ChatSummary],
+              turns: List[List[Dict[str, str]]], last_message_id: int) -> ChatSummary:
+        """Append the user requests of aged-out turns to the stored summary, keeping their newest code."""
+        lines = summary.summary.splitlines() if summary is not None else []
+        lines.extend(_summary_line(turn[0]["content"]) for turn in turns if turn[0]["role"] == "user")
+        text = "\n".join(lines[-SUMMARY_MAX_LINES:])
+        code_turn = _latest_code_turn(turns)
+        latest_code = _latest_code_block(turns[code_turn]) if code_turn is not None else None
+        if latest_code is None and summary is not None:
+            latest_code = summary.latest_code
+        if summary is None:
+            summary = ChatSummary(chat_id=chat_id)
+            db.add(summary)
+        summary.summary = text
+        summary.latest_code = latest_code
+        summary.last_message_id = last_message_id
+        summary.updated_at = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request created the summary first; theirs covers the same turns
+            db.rollback()
+            summary = ChatSummary(
+                chat_id=chat_id, summary=text, latest_code=latest_code, last_message_id=last_message_id
+            )
+        return summary
+
+
+context_window = ContextWindowManager(
+    token_budget=settings.context_token_budget,
+    recent_turns=settings.context_recent_turns,
+)
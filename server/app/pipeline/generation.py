@@ -0,0 +1,484 @@
+import asyncio
+import math
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, unit_of_work
+from app.core.ratelimit import ConcurrencyBudget, PriorityGate
+from app.crud.chat import get_chat
+from app.crud.message import create_message
+from app.crud.video import create_video
+from app.pipeline.context import context_window
+from app.pipeline.llm import PromptSession, llm_service
+from app.schemas.message import MessageCreate
+from app.schemas.video import VideoResponse, VideoCreate
+from app.service.manim import QUALITY_FLAGS, ManimService, ManimGenerationError, ManimValidationError
+from app.service.render_pool import render_pool
+from app.service.render_cache import render_cache
+from app.service.source_cache import source_video_cache
+from app.service.range_cache import range_cache
+from app.service.upload import ObjectChangedError, S3UploadService
+
+GENERATE_VIDEO_JOB = "generate_video"
+CODE_BLOCK_PATTERN = re.compile(r"```python(.*?)```", re.DOTALL)
+
+manim_service = ManimService(
+    scripts_dir=settings.scripts_dir,
+    docker_image=settings.docker_image,
+    render_pool=render_pool,
+    quality=settings.manim_quality,
+    allowed_imports=settings.manim_allowed_imports,
+    dry_run=settings.manim_dry_run_enabled,
+    parallel_sections=settings.manim_parallel_sections,
+    section_min_animations=settings.manim_section_min_animations,
+)
+
+s3_upload_service = S3UploadService()
+
+render_executor = ThreadPoolExecutor(max_workers=settings.job_workers, thread_name_prefix="render")
+final_render_executor = ThreadPoolExecutor(max_workers=settings.final_render_workers, thread_name_prefix="final-render")
+
+if settings.preview_quality is not None and settings.preview_quality not in QUALITY_FLAGS:
+    raise ValueError(f"Unknown preview quality '{settings.preview_quality}', expected one of {', '.join(QUALITY_FLAGS)}")
+
+PROGRESSIVE_RENDER = settings.preview_quality is not None and settings.preview_quality != settings.manim_quality
+
+# Final-quality upgrades only start while no user-facing render is running, and at most
+# `final_render_queue_size` of them wait or run; beyond that a preview is simply kept
+render_priority = PriorityGate()
+final_render_slots = threading.BoundedSemaphore(max(1, settings.final_render_queue_size))
+
+speculation_budget = ConcurrencyBudget(
+    global_limit=settings.speculative_global_limit,
+    per_key_limit=settings.speculative_per_user_limit,
+) if settings.speculative_candidates > 1 else None
+
+
+class RenderCancelled(Exception):
+    """Custom exception for speculative renders that lost the race"""
+    pass
+
+
+def _report(progress: Optional[Callable[[str], None]], stage: str) -> None:
+    if progress is not None:
+        progress(stage)
+
+
+def _render_cache_key(code: str) -> Optional[str]:
+    if render_cache is None:
+        return None
+    extracted = manim_service.extract_code_from_response(code)
+    return render_cache.key(extracted, manim_service.extract_scene_name(extracted))
+
+
+def render_and_upload(
+    code: str,
+    chat_id: int,
+    username: str,
+    progress: Optional[Callable[[str], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+    publish: bool = True,
+) -> Tuple[str, float]:
+    """
+    Render the code and upload it, reusing an earlier render of the same normalized source.
+
+    With `publish=False` (speculative candidates) nothing is cached and no
+    final-quality upgrade is queued; the caller publishes only the winner.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise RenderCancelled("Render cancelled before it started")
+    cache_key = _render_cache_key(code)
+    if cache_key is not None:
+        cached = render_cache.get(cache_key)
+        if cached is not None:
+            try:
+                s3_url = s3_upload_service.copy_video(cached["s3_url"], username=username, chat_id=chat_id)
+                print(f"Render cache hit for {cache_key[:12]}, copied {cached['s3_url']}")
+                return s3_url, cached["duration"]
+            except RuntimeError as e:
+                print(f"Warning: Cached render is no longer usable: {e}")
+                render_cache.invalidate(cache_key)
+
+    _report(progress, "rendering")
+    quality = settings.preview_quality if PROGRESSIVE_RENDER else None
+    with render_priority.foreground(), manim_service.generate_video(code, quality=quality) as video:
+        if cancelled is not None and cancelled.is_set():
+            raise RenderCancelled("Render cancelled before upload")
+        _report(progress, "uploading")
+        s3_url = s3_upload_service.upload_video_file(
+            video.path,
+            username=username,
+            chat_id=chat_id
+        )
+        if cancelled is not None and cancelled.is_set():
+            # Lost the race while uploading
+            s3_upload_service.delete_object(*s3_upload_service.parse_s3_url(s3_url))
+            raise RenderCancelled("Render cancelled after upload")
+        duration = video.duration
+        if publish and source_video_cache is not None:
+            source_video_cache.put_file(s3_url, video.path)
+    if publish:
+        _publish(code, cache_key, s3_url, duration)
+    return s3_url, duration
+
+
+def _publish(code: str, cache_key: Optional[str], s3_url: str, duration: float) -> None:
+    # Previews are cached only once their final-quality render has replaced them
+    if PROGRESSIVE_RENDER:
+        schedule_final_render(code, s3_url, cache_key)
+    elif cache_key is not None:
+        render_cache.put(cache_key, s3_url, duration)
+
+
+def publish_render(code: str, s3_url: str, duration: float) -> None:
+    """Cache a fresh render made with `publish=False`, or queue its upgrade if it is a preview."""
+    cache_key = _render_cache_key(code)
+    if cache_key is not None and render_cache.get(cache_key) is not None:
+        # A cache hit (the copy is already final quality), or the same code was published meanwhile
+        return
+    _publish(code, cache_key, s3_url, duration)
+
+
+def schedule_final_render(code: str, s3_url: str, cache_key: Optional[str] = None) -> None:
+    """Queue the final-quality upgrade of a preview, or keep the preview when the queue is full."""
+    bucket, key = s3_upload_service.parse_s3_url(s3_url)
+    if not final_render_slots.acquire(blocking=False):
+        print(f"Skipping final render for {key}: {settings.final_render_queue_size} upgrades already queued")
+        return
+    preview_etag = s3_upload_service.get_etag(bucket, key)
+    if preview_etag is None:
+        # Without the ETag the swap could not be made conditional
+        final_render_slots.release()
+        return
+    future = final_render_executor.submit(render_final_quality, code, s3_url, preview_etag, cache_key)
+    future.add_done_callback(lambda _: final_render_slots.release())
+
+
+def render_final_quality(code: str, s3_url: str, preview_etag: str, cache_key: Optional[str] = None) -> None:
+    """
+    Re-render a preview at the configured quality and swap it in if the object is still the preview.
+
+    Only the final render goes into the render cache, so copies made from it
+    are never stuck at preview quality.
+    """
+    bucket, key = s3_upload_service.parse_s3_url(s3_url)
+    try:
+        render_priority.wait_for_idle()
+        with manim_service.generate_video(code) as video:
+            staging_key = f"{key}.{uuid.uuid4().hex[:8]}.partial"
+            with video.open() as video_file:
+                s3_upload_service.upload_stream(video_file, bucket, staging_key)
+            # Conditional copy: a merge that replaced the preview meanwhile is never overwritten
+            try:
+                s3_upload_service.promote_object(bucket, staging_key, s3_url, if_match=preview_etag)
+            except ObjectChangedError:
+                print(f"Skipping final render for {key}: the video changed since the preview")
+                return
+            duration = video.duration
+            if source_video_cache is not None:
+                source_video_cache.put_file(s3_url, video.path)
+        if range_cache is not None:
+            range_cache.invalidate(bucket, key)
+        if cache_key is not None:
+            render_cache.put(cache_key, s3_url, duration)
+        print(f"Replaced preview {key} with {settings.manim_quality} render")
+    except Exception as e:
+        print(f"Warning: Final quality render failed for {key}: {e}")
+
+
+async def render_and_upload_async(
+    code: str,
+    chat_id: int,
+    username: str,
+    progress: Optional[Callable[[str], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+    publish: bool = True,
+) -> Tuple[str, float]:
+    """Run `render_and_upload` on the render executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        render_executor, partial(render_and_upload, code, chat_id, username, progress, cancelled, publish)
+    )
+
+
+async def render_first_success(
+    candidates: Sequence[str],
+    chat_id: int,
+    username: str,
+    progress: Optional[Callable[[str], None]] = None,
+    on_extra_done: Optional[Callable[[asyncio.Future], None]] = None,
+) -> Tuple[str, str, float]:
+    """
+    Render code candidates concurrently and return (code, s3_url, duration) of the first success.
+
+    The others are cancelled: queued renders never start, running ones are
+    dropped before upload. Only the winner is cached or upgraded. If every
+    candidate fails, the first candidate's error is raised so the retry prompt
+    matches the reply kept in the session. `on_extra_done` runs when the render
+    thread of each candidate after the first has really finished, winner or not.
+    """
+    cancelled = threading.Event()
+    tasks = {}
+    for i, code in enumerate(candidates):
+        task = asyncio.ensure_future(
+            render_and_upload_async(code, chat_id, username, progress if i == 0 else None, cancelled, publish=False)
+        )
+        if i > 0 and on_extra_done is not None:
+            task.add_done_callback(on_extra_done)
+        tasks[task] = code
+    first_task = next(iter(tasks))
+    pending = set(tasks)
+    winner = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    print(f"Speculative candidate failed: {task.exception()}")
+                elif winner is None:
+                    winner = task
+                else:
+                    # Finished in the same tick as the winner; its upload is not needed
+                    await asyncio.to_thread(
+                        s3_upload_service.delete_object, *s3_upload_service.parse_s3_url(task.result()[0])
+                    )
+        if winner is None:
+            raise first_task.exception()
+        s3_url, duration = winner.result()
+        await asyncio.to_thread(publish_render, tasks[winner], s3_url, duration)
+        return tasks[winner], s3_url, duration
+    finally:
+        cancelled.set()
+        for task in pending:
+            # The render threads keep running; remove what a late finisher uploaded
+            task.add_done_callback(_discard_speculative_upload)
+
+
+def _discard_speculative_upload(task: asyncio.Future) -> None:
+    if task.cancelled() or task.exception() is not None:
+        return
+    s3_url, _ = task.result()
+    asyncio.get_running_loop().run_in_executor(
+        None, s3_upload_service.delete_object, *s3_upload_service.parse_s3_url(s3_url)
+    )
+
+
+def store_user_message(chat_id: int, content: str) -> int:
+    """Store the prompt as soon as it is sent, so it is in the history while its video renders."""
+    with SessionLocal() as db:
+        return create_message(db=db, message=MessageCreate(content=content, role="user", chat_id=chat_id)).id
+
+
+def _save_generation(code: str, chat_id: int, s3_url: str, duration: float) -> VideoResponse:
+    """Store the reply and its video in one transaction, so a failure leaves neither behind."""
+    with unit_of_work() as db:
+        ai_message = MessageCreate(
+            content=code,
+            role="assistant",
+            chat_id=chat_id,
+            video_url=s3_url
+        )
+        ai_response = create_message(db=db, message=ai_message, commit=False)
+
+        generated_video = VideoCreate(
+            chat_id=chat_id,
+            video_url=s3_url,
+            message_id=ai_response.id,
+            duration=math.ceil(duration) or 0
+        )
+        new_video = create_video(db=db, video=generated_video, commit=False)
+        print(f"Video created with ID: {new_video.id}, URL: {new_video.video_url}, Message ID: {new_video.message_id}")
+
+        return VideoResponse(
+            text=ai_response,
+            video_response=new_video,
+        )
+
+
+async def generate_video_with_retry(
+    code: str,
+    original_content: str,
+    prompt_session: PromptSession,
+    chat_id: int,
+    username: str,
+    max_retries: int = 1,
+    progress: Optional[Callable[[str], None]] = None,
+    first_render: Optional[Awaitable[Tuple[str, float]]] = None,
+    candidates: Sequence[str] = (),
+    on_extra_done: Optional[Callable[[asyncio.Future], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> VideoResponse:
+    for attempt in range(max_retries + 1):
+        try:
+            if attempt == 0 and first_render is not None:
+                s3_url, duration = await first_render
+            elif attempt == 0 and candidates:
+                primary = code
+                code, s3_url, duration = await render_first_success(
+                    [code, *candidates], chat_id, username, progress, on_extra_done
+                )
+                if code != primary:
+                    # The first candidate is the (possibly cached) normal reply; do not serve it again
+                    llm_service.forget_cached_response(prompt_session)
+            else:
+                s3_url, duration = await render_and_upload_async(code, chat_id, username, progress, cancelled)
+            return await asyncio.to_thread(_save_generation, code, chat_id, s3_url, duration)
+
+        except ManimGenerationError as e:
+            issues = e.issues if isinstance(e, ManimValidationError) else []
+            if attempt == max_retries:
+                # Final attempt failed
+                detail = {
+                    "error": "Video generation failed after retry",
+                    "detail": str(e),
+                    "error_code": "MANIM_GENERATION_ERROR_RETRY"
+                }
+                if issues:
+                    detail["issues"] = [issue.to_dict() for issue in issues]
+                    detail["error_code"] = "MANIM_VALIDATION_ERROR_RETRY"
+                raise HTTPException(status_code=422, detail=detail)
+
+            # Prepare for retry
+            llm_service.forget_cached_response(prompt_session)
+            print(f"Error generating video (attempt {attempt + 1}): {e}")
+            print(f"Original message content: {original_content}")
+
+            if issues:
+                issue_list = "\n".join(f"- {issue}" for issue in issues)
+                error_message = f"The code was rejected before rendering:\n{issue_list}\nPlease fix the code and try again."
+            else:
+                error_message = f"Video generation failed: {str(e)}. Please fix the code and try again."
+            reprompt_content = f"{original_content}\n\n{error_message}"
+
+            try:
+                await asyncio.to_thread(_report, progress, "regenerating_code")
+                code = await llm_service.generate_manim_code(reprompt_content, prompt_session)
+                print(f"[server] Regenerated code (attempt {attempt + 2}): {code}")
+            except Exception as llm_error:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"LLM regeneration failed: {str(llm_error)}"
+                )
+
+
+def _prompt_session_for(db: Session, chat_id: int, message_id: int) -> PromptSession:
+    chat = get_chat(db=db, chat_id=chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    # The new user message is already stored; generate_manim_code adds it to the session itself
+    return context_window.build_session(db, chat_id, exclude_message_id=message_id)
+
+
+def _load_prompt_session(chat_id: int, message_id: int) -> PromptSession:
+    with SessionLocal() as db:
+        return _prompt_session_for(db, chat_id, message_id)
+
+
+async def run_generate_video_job(job: dict, progress: Callable[[str], None]) -> dict:
+    """Job handler for a user message: generate Manim code, render it and store the result."""
+    payload = job["payload"]
+    prompt_session = await asyncio.to_thread(_load_prompt_session, payload["chat_id"], payload["message_id"])
+
+    await asyncio.to_thread(progress, "generating_code")
+    extra = rendering = 0
+    if speculation_budget is not None:
+        extra = speculation_budget.try_acquire(payload["username"], settings.speculative_candidates - 1)
+
+    def release_slot(_task: asyncio.Future) -> None:
+        # Each extra candidate holds its slot until its render thread is done, even after losing
+        speculation_budget.release(payload["username"], 1)
+
+    try:
+        if extra:
+            generated_code, *candidates = await llm_service.generate_manim_code_candidates(
+                payload["content"], prompt_session, extra + 1
+            )
+        else:
+            generated_code = await llm_service.generate_manim_code(payload["content"], prompt_session)
+            candidates = []
+        print(f"[server] Generated code: {generated_code}")
+
+        # render_first_success starts every candidate right away, and each releases its own slot
+        rendering = len(candidates)
+        response = await generate_video_with_retry(
+            code=generated_code,
+            original_content=payload["content"],
+            prompt_session=prompt_session,
+            chat_id=payload["chat_id"],
+            username=payload["username"],
+            progress=progress,
+            candidates=candidates,
+            on_extra_done=release_slot,
+        )
+    finally:
+        if speculation_budget is not None:
+            speculation_budget.release(payload["username"], extra - rendering)
+    return response.model_dump(mode="json")
+
+
+async def stream_generate_video(payload: dict, keepalive_interval: float = 10) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Stream code tokens for a user message as (event, data) pairs.
+
+    The render starts as soon as the closing fence of the python block has
+    arrived, while the rest of the reply is still being generated.
+    """
+    render_task = None
+    # Set when the client goes away, so the render thread drops its upload instead of storing a result
+    cancelled = threading.Event()
+    try:
+        prompt_session = await asyncio.to_thread(_load_prompt_session, payload["chat_id"], payload["message_id"])
+
+        reply = ""
+        async for delta in llm_service.stream_manim_code(payload["content"], prompt_session):
+            reply += delta
+            yield "token", {"text": delta}
+            if render_task is None:
+                match = CODE_BLOCK_PATTERN.search(reply)
+                if match:
+                    render_task = asyncio.ensure_future(
+                        render_and_upload_async(match.group(0), payload["chat_id"], payload["username"], cancelled=cancelled)
+                    )
+                    yield "stage", {"stage": "rendering"}
+
+        if render_task is None:
+            render_task = asyncio.ensure_future(
+                render_and_upload_async(reply, payload["chat_id"], payload["username"], cancelled=cancelled)
+            )
+            yield "stage", {"stage": "rendering"}
+
+        while not render_task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(render_task), timeout=keepalive_interval)
+            except asyncio.TimeoutError:
+                yield "keepalive", {}
+            except Exception:
+                break
+
+        response = await generate_video_with_retry(
+            code=reply,
+            original_content=payload["content"],
+            prompt_session=prompt_session,
+            chat_id=payload["chat_id"],
+            username=payload["username"],
+            first_render=render_task,
+            cancelled=cancelled,
+        )
+        yield "result", response.model_dump(mode="json")
+
+    except HTTPException as e:
+        yield "error", {"status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        yield "error", {"status_code": 500, "detail": str(e)}
+    finally:
+        cancelled.set()
+        if render_task is not None and not render_task.done():
+            render_task.cancel()
@@ -1,23 +1,52 @@
-import uuid
-from openai import OpenAI
-from typing import List, Dict
-from pathlib import Path
+import asyncio
+import hashlib
+import httpx
+from contextlib import asynccontextmanager
+from openai import AsyncOpenAI
+from typing import List, Dict, Optional, AsyncIterator
 from google import genai
 from google.genai import types
-import wave
 from app.core.config import settings
+from app.core.ratelimit import AsyncTokenBucket
 import re
+from app.pipeline.llm_cache import LLMResponseCache, llm_response_cache
+from app.pipeline.tts_cache import TTSCache, tts_cache
 
 
-def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
-   with wave.open(filename, "wb") as wf:
-      wf.setnchannels(channels)
-      wf.setsampwidth(sample_width)
-      wf.setframerate(rate)
-      wf.writeframes(pcm)
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_VOICE = "Kore"
+TTS_SAMPLE_RATE = 24000
+TTS_SAMPLE_WIDTH = 2
 
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
 
 
+def _ends_chunk(sentence: str) -> bool:
+    # Content-defined boundary (about one in four sentences), so editing one
+    # sentence does not shift the chunks after it and cached audio stays usable
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=1).digest()[0] % 4 == 0
+
+
+def split_narration(text: str, max_chars: int) -> List[str]:
+    """Split a script into chunks of whole sentences, never crossing a paragraph break."""
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = ""
+        for sentence in SENTENCE_END_PATTERN.split(paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            if not sentence:
+                continue
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+            if _ends_chunk(sentence):
+                chunks.append(current)
+                current = ""
+        if current:
+            chunks.append(current)
+    return chunks
+
 
 class LLMGenerationError(Exception):
     """Custom exception for LLM generation errors"""
@@ -26,6 +55,7 @@ class LLMGenerationError(Exception):
 class PromptSession:
     def __init__(self, history: List[Dict[str, str]] = None):
         self.history: List[Dict[str, str]] = history or []
+        self.cache_key: Optional[str] = None
 
     def add_prompt(self, prompt: str):
         self.history.append({"role": "user", "content": prompt})
@@ -33,8 +63,11 @@ class PromptSession:
     def add_response(self, response: str):
         self.history.append({"role": "assistant", "content": response})
 
-    def get_chat_history(self):
-        preamble = [
+    def is_first_turn(self) -> bool:
+        return len(self.history) == 1 and self.history[0]["role"] == "user"
+
+    def get_preamble(self):
+        return [
             {
                 "role": "system",
                 "content": (
@@ -170,62 +203,130 @@ class PromptSession:
                 )
             }
         ]
-        return preamble + self.history
+
+    def get_chat_history(self):
+        return self.get_preamble() + self.history
 
 
 class LLMService:
-    def __init__(self, api_key: str, base_url: str = settings.llm_base_url, model: str = "gemini-2.5-flash"):
+    """
+    Async client for code, narration and speech generation.
+
+    One instance is shared by the whole app so that every request reuses the
+    same keep-alive connection pool. Calls are bounded by a concurrency
+    semaphore and a token bucket sized to the provider quota.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = settings.llm_base_url,
+        model: str = "gemini-2.5-flash",
+        response_cache: Optional[LLMResponseCache] = None,
+        tts_cache: Optional[TTSCache] = None,
+        max_concurrency: int = settings.llm_max_concurrency,
+        requests_per_minute: int = settings.llm_requests_per_minute,
+        max_connections: int = settings.llm_max_connections,
+        timeout: float = settings.llm_timeout,
+    ):
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
-        self.gemini_client = genai.Client(api_key=api_key)
-
-    def generate_speech_from_text(self, text: str):
-        response = self.gemini_client.models.generate_content(
-            model="gemini-2.5-flash-preview-tts",
-            contents=text,
-            config=types.GenerateContentConfig(
-                response_modalities=["AUDIO"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name='Kore',
+        self.response_cache = response_cache
+        self.tts_cache = tts_cache
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client)
+        # Both SDKs send their requests through the same pool
+        self.gemini_client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(httpx_async_client=self.http_client),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = AsyncTokenBucket(
+            rate_per_second=requests_per_minute / 60,
+            capacity=max(1, requests_per_minute // 6),
+        ) if requests_per_minute > 0 else None
+
+    @asynccontextmanager
+    async def _limited(self):
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire()
+        async with self._semaphore:
+            yield
+
+    async def aclose(self) -> None:
+        await self.gemini_client.aio.aclose()
+        await self.client.close()
+        await self.http_client.aclose()
+        # genai also builds a sync client that this service never uses
+        self.gemini_client.close()
+
+    async def _synthesize_speech(self, text: str) -> bytes:
+        async with self._limited():
+            response = await self.gemini_client.aio.models.generate_content(
+                model=TTS_MODEL,
+                contents=text,
+                config=types.GenerateContentConfig(
+                    response_modalities=["AUDIO"],
+                    speech_config=types.SpeechConfig(
+                        voice_config=types.VoiceConfig(
+                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                                voice_name=TTS_VOICE,
+                            )
                         )
-                    )
-                ),
+                    ),
+                )
             )
-        )
-
-        data = response.candidates[0].content.parts[0].inline_data.data
-
-        file_name =  f"out_{uuid.uuid4().hex[:8]}.wav"
-        Path('audios').mkdir(parents=True, exist_ok=True)
-        wave_file(f"audios/{file_name}", data)
-
-        return file_name
 
-    def generate_script_from_code(self, code: str, video_duration: int, mode: str = "compact") -> str:
+        return response.candidates[0].content.parts[0].inline_data.data
+
+    async def generate_speech_from_text(self, text: str) -> bytes:
+        """
+        Synthesize sentence-sized chunks concurrently and join them with short pauses.
+
+        Returns raw PCM (TTS_SAMPLE_RATE Hz, mono, 16-bit little endian).
+        """
+        chunks = split_narration(text, settings.tts_chunk_max_chars) or [text]
+        semaphore = asyncio.Semaphore(settings.tts_max_parallel)
+
+        async def synthesize(chunk: str) -> bytes:
+            if self.tts_cache is not None:
+                cached = await asyncio.to_thread(self.tts_cache.get, TTS_MODEL, TTS_VOICE, chunk)
+                if cached is not None:
+                    return cached
+            async with semaphore:
+                pcm = await self._synthesize_speech(chunk)
+            if self.tts_cache is not None:
+                await asyncio.to_thread(self.tts_cache.put, TTS_MODEL, TTS_VOICE, chunk, pcm)
+            return pcm
+
+        pcm_chunks = await asyncio.gather(*(synthesize(chunk) for chunk in chunks))
+        gap = b"\0" * (TTS_SAMPLE_RATE * TTS_SAMPLE_WIDTH * settings.tts_chunk_gap_ms // 1000)
+        return gap.join(pcm_chunks)
+
+    async def generate_script_from_code(self, code: str, video_duration: int, mode: str = "compact") -> str:
         try:
             if mode not in ["compact", "detailed"]:
                 raise ValueError("Mode must be either 'compact' or 'detailed'")
 
             system_content = self._get_system_prompt(mode, code, video_duration)
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_content
-                    },
-                    {
-                        "role": "user",
-                        "content": code
-                    }
-                ],
-                temperature=0.3,
-            )
+            async with self._limited():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_content
+                        },
+                        {
+                            "role": "user",
+                            "content": code
+                        }
+                    ],
+                    temperature=0.3,
+                )
 
             if not response.choices:
                 raise LLMGenerationError("No response from model")
@@ -274,15 +375,25 @@ class LLMService:
                 "Structure the explanation logically, building from basic concepts to more advanced ideas."
             )
 
-    def generate_manim_code(self, prompt: str, session: PromptSession) -> str:
+    async def generate_manim_code(self, prompt: str, session: PromptSession) -> str:
+        temperature = 0.3
         try:
             session.add_prompt(prompt)
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=session.get_chat_history(),
-                temperature=0.3,
-            )
+            use_cache = self.response_cache is not None and session.is_first_turn()
+            if use_cache:
+                cached = self.response_cache.lookup(self.model, temperature, session.get_preamble(), session.history)
+                if cached is not None:
+                    session.cache_key, assistant_reply = cached
+                    session.add_response(assistant_reply)
+                    return assistant_reply
+
+            async with self._limited():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=session.get_chat_history(),
+                    temperature=temperature,
+                )
 
             if not response.choices:
                 raise LLMGenerationError("No response from model")
@@ -291,8 +402,102 @@ class LLMService:
             if not assistant_reply:
                 raise LLMGenerationError("Empty response from model")
 
+            if use_cache:
+                session.cache_key = self.response_cache.put(
+                    self.model, temperature, session.get_preamble(), session.history, assistant_reply
+                )
             session.add_response(assistant_reply)
             return assistant_reply
 
         except Exception as e:
             raise LLMGenerationError(f"Failed to generate code: {str(e)}") from e
+
+    async def _sample_manim_code(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        async with self._limited():
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+            )
+        if not response.choices or not response.choices[0].message.content:
+            raise LLMGenerationError("Empty response from model")
+        return response.choices[0].message.content
+
+    async def generate_manim_code_candidates(self, prompt: str, session: PromptSession, n: int) -> List[str]:
+        """
+        Request n replies in parallel for speculative rendering.
+
+        The first is the regular (cacheable) reply that goes into the session;
+        the others are sampled at a higher temperature so they actually differ.
+        Failed extras are dropped; the call only fails when every request does.
+        """
+        messages = session.get_chat_history() + [{"role": "user", "content": prompt}]
+        results = await asyncio.gather(
+            self.generate_manim_code(prompt, session),
+            *(self._sample_manim_code(messages, temperature=0.8) for _ in range(n - 1)),
+            return_exceptions=True,
+        )
+        candidates = [r for r in results if isinstance(r, str)]
+        if not candidates:
+            error = results[0]
+            raise error if isinstance(error, LLMGenerationError) else LLMGenerationError(f"Failed to generate code: {error}")
+        if not isinstance(results[0], str):
+            # The session must end with a reply for a retry prompt to follow
+            session.add_response(candidates[0])
+        return candidates
+
+    async def stream_manim_code(self, prompt: str, session: PromptSession) -> AsyncIterator[str]:
+        """Like generate_manim_code, but yields the reply as it is generated."""
+        temperature = 0.3
+        session.add_prompt(prompt)
+
+        use_cache = self.response_cache is not None and session.is_first_turn()
+        if use_cache:
+            cached = self.response_cache.lookup(self.model, temperature, session.get_preamble(), session.history)
+            if cached is not None:
+                session.cache_key, assistant_reply = cached
+                session.add_response(assistant_reply)
+                yield assistant_reply
+                return
+
+        parts = []
+        try:
+            async with self._limited():
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=session.get_chat_history(),
+                    temperature=temperature,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            raise LLMGenerationError(f"Failed to generate code: {str(e)}") from e
+
+        assistant_reply = "".join(parts)
+        if not assistant_reply:
+            raise LLMGenerationError("Empty response from model")
+
+        if use_cache:
+            session.cache_key = self.response_cache.put(
+                self.model, temperature, session.get_preamble(), session.history, assistant_reply
+            )
+        session.add_response(assistant_reply)
+
+    def forget_cached_response(self, session: PromptSession) -> None:
+        """Drop the cached reply used for this session, e.g. after its code failed to render."""
+        if self.response_cache is not None and session.cache_key is not None:
+            self.response_cache.discard(session.cache_key)
+            session.cache_key = None
+
+
+llm_service = LLMService(
+    api_key=settings.llm_api_key,
+    response_cache=llm_response_cache,
+    tts_cache=tts_cache,
+)
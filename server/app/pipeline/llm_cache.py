@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def _hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word n-gram shingles, used to spot near-duplicate prompts."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 2, seed: int = 1):
+        self.shingle_size = shingle_size
+        self._permutations = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+            b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+            self._permutations.append((a, b))
+
+    def shingles(self, text: str) -> set:
+        words = re.findall(r"\w+", _normalize_text(text))
+        shingles = set()
+        for n in range(1, self.shingle_size + 1):
+            for i in range(len(words) - n + 1):
+                shingles.add(" ".join(words[i:i + n]))
+        return shingles
+
+    def signature(self, text: str) -> List[int]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in self.shingles(text)
+        ]
+        if not hashes:
+            return [_MAX_HASH] * len(self._permutations)
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        ]
+
+    @staticmethod
+    def similarity(first: List[int], second: List[int]) -> float:
+        matches = sum(1 for x, y in zip(first, second) if x == y)
+        return matches / len(first) if first else 0.0
+
+
+class MemoryResponseStore:
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float]):
+        self.max_entries = max_entries
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._cache.get(key)
+
+    def set(self, key: str, entry: dict) -> None:
+        self._cache.set(key, entry)
+
+    def pop(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def items(self) -> List[Tuple[str, dict]]:
+        return self._cache.items()
+
+
+class DiskResponseStore:
+    """One JSON file per entry; file mtime doubles as the LRU clock."""
+
+    def __init__(self, directory: Path, max_entries: int, ttl_seconds: Optional[float]):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _load(self, path: Path) -> Optional[dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get("expires_at") is not None and entry["expires_at"] < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        entry = self._load(path)
+        if entry is not None:
+            os.utime(path)
+        return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        entry = dict(entry, expires_at=time.time() + self.ttl_seconds if self.ttl_seconds else None)
+        temp_path = self.directory / f".{key}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def pop(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def items(self) -> List[Tuple[str, dict]]:
+        entries = []
+        for path in self.directory.glob("*.json"):
+            entry = self._load(path)
+            if entry is not None:
+                entries.append((path.stem, entry))
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            paths = list(self.directory.glob("*.json"))
+            if len(paths) <= self.max_entries:
+                return
+            paths.sort(key=lambda p: p.stat().st_mtime)
+            for path in paths[:len(paths) - self.max_entries]:
+                path.unlink(missing_ok=True)
+
+
+class LLMResponseCache:
+    """
+    Cache of first-turn Manim code responses.
+
+    Exact hits are keyed on (model, temperature, preamble hash, normalized
+    history). When a similarity threshold is set, a MinHash index over the
+    prompt text also lets trivially rephrased prompts reuse earlier code.
+    """
+
+    def __init__(self, store, similarity_threshold: Optional[float] = None):
+        self.store = store
+        self.similarity_threshold = similarity_threshold
+        self.minhasher = MinHasher()
+        self._signatures: Dict[str, Tuple[str, List[int]]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        if similarity_threshold is not None:
+            for key, entry in store.items():
+                self._signatures[key] = (entry["scope"], entry["signature"])
+
+    @staticmethod
+    def _scope(model: str, temperature: float, preamble: List[Dict[str, str]]) -> str:
+        return _hash_json([model, temperature, _hash_json(preamble)])
+
+    @staticmethod
+    def _prompt_text(history: List[Dict[str, str]]) -> str:
+        return "\n".join(m["content"] for m in history if m["role"] == "user")
+
+    def key(self, model: str, temperature: float, preamble: List[Dict[str, str]], history: List[Dict[str, str]]) -> str:
+        normalized_history = [[m["role"], _normalize_text(m["content"])] for m in history]
+        return _hash_json([self._scope(model, temperature, preamble), normalized_history])
+
+    def lookup(self, model: str, temperature: float, preamble: List[Dict[str, str]], history: List[Dict[str, str]]) -> Optional[Tuple[str, str]]:
+        """Return (cache key, response) for an exact or near-duplicate prompt."""
+        key = self.key(model, temperature, preamble, history)
+        entry = self.store.get(key)
+        if entry is not None:
+            self.exact_hits += 1
+            return key, entry["response"]
+
+        if self.similarity_threshold is not None:
+            scope = self._scope(model, temperature, preamble)
+            signature = self.minhasher.signature(self._prompt_text(history))
+            with self._lock:
+                candidates = list(self._signatures.items())
+            best_key, best_score = None, 0.0
+            for candidate_key, (candidate_scope, candidate_signature) in candidates:
+                if candidate_scope != scope:
+                    continue
+                score = MinHasher.similarity(signature, candidate_signature)
+                if score > best_score:
+                    best_key, best_score = candidate_key, score
+            if best_key is not None and best_score >= self.similarity_threshold:
+                entry = self.store.get(best_key)
+                if entry is not None:
+                    self.similar_hits += 1
+                    return best_key, entry["response"]
+                self._forget_signature(best_key)
+
+        self.misses += 1
+        return None
+
+    def put(self, model: str, temperature: float, preamble: List[Dict[str, str]], history: List[Dict[str, str]], response: str) -> str:
+        key = self.key(model, temperature, preamble, history)
+        scope = self._scope(model, temperature, preamble)
+        signature = self.minhasher.signature(self._prompt_text(history)) if self.similarity_threshold is not None else []
+        self.store.set(key, {"response": response, "scope": scope, "signature": signature})
+        if self.similarity_threshold is not None:
+            with self._lock:
+                self._signatures[key] = (scope, signature)
+                self._prune_signatures()
+        return key
+
+    def discard(self, key: str) -> None:
+        self.store.pop(key)
+        self._forget_signature(key)
+
+    def _forget_signature(self, key: str) -> None:
+        with self._lock:
+            self._signatures.pop(key, None)
+
+    def _prune_signatures(self) -> None:
+        # Evicted or expired store entries leave stale signatures behind; drop them once the index outgrows the store
+        if len(self._signatures) > 2 * self.store.max_entries:
+            live = {key for key, _ in self.store.items()}
+            self._signatures = {k: v for k, v in self._signatures.items() if k in live}
+
+    def stats(self) -> dict:
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "indexed_prompts": len(self._signatures),
+        }
+
+
+def create_llm_response_cache() -> Optional[LLMResponseCache]:
+    ttl = settings.llm_cache_ttl_seconds
+    if settings.llm_cache_backend == "memory":
+        store = MemoryResponseStore(settings.llm_cache_max_entries, ttl)
+    elif settings.llm_cache_backend == "disk":
+        store = DiskResponseStore(settings.llm_cache_dir, settings.llm_cache_max_entries, ttl)
+    elif settings.llm_cache_backend == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown LLM cache backend: {settings.llm_cache_backend}")
+    return LLMResponseCache(store, similarity_threshold=settings.llm_cache_similarity_threshold)
+
+
+llm_response_cache = create_llm_response_cache()
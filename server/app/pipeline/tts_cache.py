@@ -0,0 +1,35 @@
+import json
+from typing import Optional
+
+from app.core.cache import DiskLRUCache
+from app.core.config import settings
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized PCM per narration chunk.
+
+    Keys are (model, voice, whitespace-normalized text); case and punctuation
+    are kept since they change the delivery.
+    """
+
+    def __init__(self, store: DiskLRUCache):
+        self.store = store
+
+    @staticmethod
+    def key(model: str, voice: str, text: str) -> str:
+        return json.dumps([model, voice, " ".join(text.split())])
+
+    def get(self, model: str, voice: str, text: str) -> Optional[bytes]:
+        return self.store.get(self.key(model, voice, text))
+
+    def put(self, model: str, voice: str, text: str, pcm: bytes) -> None:
+        self.store.set(self.key(model, voice, text), pcm)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+tts_cache = TTSCache(
+    DiskLRUCache(settings.tts_cache_dir, settings.tts_cache_max_bytes)
+) if settings.tts_cache_enabled else None
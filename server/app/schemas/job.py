@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Any
+
+
+class Job(BaseModel):
+  id: str
+  kind: str
+  status: str
+  stage: Optional[str] = None
+  result: Optional[Any] = None
+  error: Optional[Any] = None
+  created_at: datetime
+  updated_at: datetime
+
+  class Config:
+    from_attributes = True
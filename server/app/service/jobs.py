@@ -0,0 +1,276 @@
+import asyncio
+import inspect
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.job import Job as JobModel
+from app.schemas.job import Job
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+
+class InMemoryJobQueue:
+    """Job queue kept in this process; jobs are only visible to the API worker that created them."""
+
+    def __init__(self, retention_seconds: int = 3600):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, dict] = {}
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind: str, payload: dict, user_id: Optional[int] = None) -> Job:
+        now = datetime.utcnow()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": JOB_QUEUED,
+            "stage": JOB_QUEUED,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "user_id": user_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job["id"]] = job
+            self._pending.append(job["id"])
+        return Job(**job)
+
+    def claim(self) -> Optional[dict]:
+        with self._lock:
+            while self._pending:
+                job = self._jobs.get(self._pending.popleft())
+                if job is not None and job["status"] == JOB_QUEUED:
+                    job["status"] = JOB_RUNNING
+                    job["updated_at"] = datetime.utcnow()
+                    return dict(job)
+        return None
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=datetime.utcnow())
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**job) if job is not None else None
+
+    def get_owner(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["user_id"] if job is not None else None
+
+    def _prune(self) -> None:
+        cutoff = datetime.utcnow().timestamp() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATUSES and job["updated_at"].timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class DatabaseJobQueue:
+    """
+    Job queue stored in the `jobs` table (SQLite or Postgres).
+
+    Any API worker sharing the database can claim queued jobs and serve
+    their status, so generations are spread across processes. A running job
+    holds a lease that every update refreshes (`updated_at`); once it is older
+    than `lease_seconds` the worker is presumed dead and the job is failed.
+    """
+
+    def __init__(self, lease_seconds: int = 120):
+        self.lease_seconds = lease_seconds
+        self._next_expiry_check = 0.0
+
+    def enqueue(self, kind: str, payload: dict, user_id: Optional[int] = None) -> Job:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            db_job = JobModel(
+                id=uuid.uuid4().hex,
+                kind=kind,
+                status=JOB_QUEUED,
+                stage=JOB_QUEUED,
+                payload=payload,
+                user_id=user_id,
+                created_at=now,
+                updated_at=now,
+            )
+            db.add(db_job)
+            db.commit()
+            db.refresh(db_job)
+            return Job.model_validate(db_job)
+
+    def claim(self) -> Optional[dict]:
+        with SessionLocal() as db:
+            if time.monotonic() >= self._next_expiry_check:
+                self._fail_expired(db)
+                self._next_expiry_check = time.monotonic() + self.lease_seconds / 2
+            while True:
+                job_id = db.query(JobModel.id).filter(
+                    JobModel.status == JOB_QUEUED
+                ).order_by(JobModel.created_at).limit(1).scalar()
+                if job_id is None:
+                    return None
+                # Conditional update so that only one worker wins the job, even without row locks
+                claimed = db.execute(
+                    update(JobModel)
+                    .where(JobModel.id == job_id, JobModel.status == JOB_QUEUED)
+                    .values(status=JOB_RUNNING, updated_at=datetime.utcnow())
+                ).rowcount
+                db.commit()
+                if claimed:
+                    db_job = db.get(JobModel, job_id)
+                    return {"id": db_job.id, "kind": db_job.kind, "payload": db_job.payload, "user_id": db_job.user_id}
+
+    def _fail_expired(self, db) -> None:
+        now = datetime.utcnow()
+        expired = db.execute(
+            update(JobModel)
+            .where(JobModel.status == JOB_RUNNING, JobModel.updated_at < now - timedelta(seconds=self.lease_seconds))
+            .values(status=JOB_FAILED, stage=JOB_FAILED, error="Job was interrupted before it finished", updated_at=now)
+        ).rowcount
+        db.commit()
+        if expired:
+            print(f"Warning: Failed {expired} job(s) whose worker stopped refreshing the lease")
+
+    def update(self, job_id: str, **fields) -> None:
+        """Set fields on a job; any update, even without fields, refreshes a running job's lease."""
+        with SessionLocal() as db:
+            db.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id)
+                .values(**fields, updated_at=datetime.utcnow())
+            )
+            db.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with SessionLocal() as db:
+            db_job = db.get(JobModel, job_id)
+            return Job.model_validate(db_job) if db_job is not None else None
+
+    def get_owner(self, job_id: str) -> Optional[int]:
+        with SessionLocal() as db:
+            return db.query(JobModel.user_id).filter(JobModel.id == job_id).scalar()
+
+
+def create_job_queue(backend: str):
+    if backend == "memory":
+        return InMemoryJobQueue()
+    if backend == "database":
+        return DatabaseJobQueue(lease_seconds=settings.job_lease_seconds)
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+
+class JobProgress:
+    """Handed to job handlers so they can report the stage they are in."""
+
+    def __init__(self, queue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def __call__(self, stage: str) -> None:
+        self.queue.update(self.job_id, stage=stage)
+
+
+class JobRunner:
+    """Runs queued jobs on the event loop with a fixed number of concurrent workers."""
+
+    def __init__(self, queue, concurrency: int = 4, poll_interval: float = 0.5, heartbeat_interval: float = 40):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._handlers: Dict[str, Callable[[dict, JobProgress], Any]] = {}
+        self._tasks = []
+
+    def register(self, kind: str, handler: Callable[[dict, JobProgress], Any]) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except Exception as e:
+                print(f"Warning: Failed to claim job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run(job)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        # Keeps the lease of a long render alive between progress updates
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await asyncio.to_thread(self.queue.update, job_id)
+            except Exception as e:
+                print(f"Warning: Failed to refresh lease of job {job_id}: {e}")
+
+    async def _run(self, job: dict) -> None:
+        progress = JobProgress(self.queue, job["id"])
+        handler = self._handlers.get(job["kind"])
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            if inspect.iscoroutinefunction(handler):
+                result = await handler(job, progress)
+            else:
+                result = await asyncio.to_thread(handler, job, progress)
+            await asyncio.to_thread(
+                self.queue.update, job["id"], status=JOB_COMPLETED, stage=JOB_COMPLETED, result=result
+            )
+        except asyncio.CancelledError:
+            await asyncio.to_thread(
+                self.queue.update, job["id"], status=JOB_FAILED, stage=JOB_FAILED, error="Job was cancelled"
+            )
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"Job {job['id']} ({job['kind']}) failed: {error}")
+            await asyncio.to_thread(
+                self.queue.update, job["id"], status=JOB_FAILED, stage=JOB_FAILED, error=error
+            )
+        finally:
+            heartbeat.cancel()
+        print(f"Job {job['id']} ({job['kind']}) finished in {time.monotonic() - started:.1f}s")
+
+
+job_queue = create_job_queue(settings.job_queue_backend)
+
+job_runner = JobRunner(
+    job_queue,
+    concurrency=settings.job_workers,
+    poll_interval=settings.job_poll_interval,
+    heartbeat_interval=settings.job_lease_seconds / 3,
+)
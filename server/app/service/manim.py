@@ -3,20 +3,73 @@ import uuid
 import re
 import os
 import shutil
-import base64
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 from contextlib import contextmanager
+from app.core.config import settings
+from app.service.render_pool import RenderWorkerPool, RenderWorkerError, ManimRenderFailed
+from app.service.media_probe import media_probe
+from app.service.manim_validation import ValidationIssue, find_code_issues, issues_from_render_output
+from app.service.manim_sections import concat_videos, find_animation_weights, plan_sections
+
+
+# Output directory name -> manim CLI quality flag
+QUALITY_FLAGS = {
+    "480p15": "-ql",
+    "720p30": "-qm",
+    "1080p60": "-qh",
+    "1440p60": "-qp",
+    "2160p60": "-qk",
+}
 
 
 class ManimGenerationError(Exception):
     """Custom exception for Manim generation errors"""
     pass
 
+class ManimValidationError(ManimGenerationError):
+    """Custom exception for code rejected before rendering"""
+
+    def __init__(self, issues: List[ValidationIssue]):
+        self.issues = issues
+        super().__init__("Code validation failed: " + "; ".join(str(issue) for issue in issues))
+
+class RenderedVideo:
+    """A rendered video on disk; the duration is probed on first access."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self._duration: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self._duration is None:
+            self._duration = media_probe.probe(self.path).duration
+        return self._duration
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
 class ManimService:
-    def __init__(self, scripts_dir: Path, docker_image: str = "manimcommunity/manim"):
+    def __init__(self, scripts_dir: Path, docker_image: str = "manimcommunity/manim", render_pool: Optional[RenderWorkerPool] = None, quality: str = "720p30",
+                 allowed_imports: Iterable[str] = tuple(settings.manim_allowed_imports), dry_run: bool = False,
+                 parallel_sections: int = 1, section_min_animations: int = 4):
+        if quality not in QUALITY_FLAGS:
+            raise ValueError(f"Unknown Manim quality '{quality}', expected one of {', '.join(QUALITY_FLAGS)}")
         self.scripts_dir = Path(scripts_dir)
         self.docker_image = docker_image
+        self.render_pool = render_pool
+        self.quality = quality
+        self.allowed_imports = set(allowed_imports)
+        self.dry_run_enabled = dry_run
+        self.parallel_sections = parallel_sections
+        self.section_min_animations = section_min_animations
+        self._section_executor = ThreadPoolExecutor(
+            max_workers=parallel_sections, thread_name_prefix="manim-section"
+        ) if parallel_sections > 1 else None
         self.scripts_dir.mkdir(parents=True, exist_ok=True)
 
     def extract_code_from_response(self, response_text: str) -> str:
@@ -76,12 +129,13 @@ class ManimService:
                 except Exception as e:
                     print(f"Warning: Failed to delete temporary script file {script_path}: {e}")
 
-    def run_manim_docker(self, script_filename: str, scene_name: str, timeout: int = 300) -> subprocess.CompletedProcess:
+    def run_manim_docker(self, script_filename: str, scene_name: str, timeout: int = 300, quality: Optional[str] = None,
+                         extra_args: Sequence[str] = ()) -> subprocess.CompletedProcess:
         docker_command = [
             "docker", "run", "--rm",
             "-v", f"{self.scripts_dir}:/manim",
             self.docker_image,
-            "manim", "-qm", script_filename, scene_name
+            "manim", QUALITY_FLAGS[quality or self.quality], *extra_args, script_filename, scene_name
         ]
         try:
             result = subprocess.run(
@@ -108,15 +162,85 @@ class ManimService:
         except FileNotFoundError as e:
             raise ManimGenerationError("Docker is not installed or not in PATH") from e
 
-    def find_generated_video(self, script_filename: str, scene_name: str) -> Path:
+    def run_manim(self, script_filename: str, scene_name: str, timeout: int = 300, quality: Optional[str] = None,
+                  extra_args: Sequence[str] = ()) -> None:
+        """Render with a warm pooled worker when configured, otherwise with a one-off container."""
+        if self.render_pool is None:
+            self.run_manim_docker(script_filename, scene_name, timeout, quality, extra_args)
+            return
+        try:
+            output = self.render_pool.render([QUALITY_FLAGS[quality or self.quality], *extra_args, script_filename, scene_name], timeout)
+            print(f"Render worker output: {output}")
+        except RenderWorkerError as e:
+            raise ManimGenerationError(f"Render worker failed: {e}") from e
+
+    def validate_code(self, code: str, scene_name: Optional[str] = None) -> None:
+        issues = find_code_issues(code, self.allowed_imports, scene_name)
+        if issues:
+            raise ManimValidationError(issues)
+
+    def dry_run(self, script_filename: str, scene_name: str, timeout: int = 300) -> None:
+        """Run construct() without writing frames in a warm worker; skipped when there is no pool."""
+        if self.render_pool is None:
+            return
+        try:
+            self.render_pool.render(["--dry_run", "-ql", script_filename, scene_name], timeout)
+        except ManimRenderFailed as e:
+            raise ManimValidationError(issues_from_render_output(str(e), script_filename)) from e
+        except RenderWorkerError as e:
+            # A worker problem says nothing about the code; let the real render decide
+            print(f"Warning: Dry run skipped: {e}")
+
+    def plan_sections(self, code: str, scene_name: str) -> List[Tuple[int, int]]:
+        """Animation index ranges to render in parallel; empty when the scene should render in one pass."""
+        if self._section_executor is None:
+            return []
+        weights = find_animation_weights(code, scene_name)
+        if not weights:
+            return []
+        return plan_sections(weights, self.parallel_sections, self.section_min_animations)
+
+    def render_sections(self, code: str, script_filename: str, scene_name: str, sections: List[Tuple[int, int]],
+                        timeout: int = 300, quality: Optional[str] = None) -> Path:
+        """
+        Render each range of animations from its own copy of the script and join the results.
+
+        Every section runs construct() from the start with `-n first,last`, so the
+        animations before its range are skipped rather than rendered. Separate
+        script names keep the sections' media directories apart.
+        """
         base_name = script_filename.replace('.py', '')
-        quality_dirs = ["720p30", "1080p60", "480p15", "1440p60", "2160p60"]
+        section_files = [f"{base_name}_s{i}.py" for i in range(len(sections))]
+        for section_file in section_files:
+            (self.scripts_dir / section_file).write_text(code, encoding="utf-8")
+
+        def render(index: int) -> Path:
+            start, end = sections[index]
+            # The last section has no upper bound, in case the estimate missed an animation
+            animations = f"{start},{end}" if index < len(sections) - 1 else str(start)
+            self.run_manim(section_files[index], scene_name, timeout, quality, extra_args=["-n", animations])
+            return self.find_generated_video(section_files[index], scene_name, quality)
 
-        for quality in quality_dirs:
-            video_path = (self.scripts_dir / "media" / "videos" /
-                         base_name / quality / f"{scene_name}.mp4")
-            if video_path.exists():
-                return video_path
+        try:
+            futures = [self._section_executor.submit(render, i) for i in range(len(sections))]
+            wait(futures)
+            parts = [future.result() for future in futures]
+            output_path = (self.scripts_dir / "media" / "videos" / base_name /
+                           (quality or self.quality) / f"{scene_name}.mp4")
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            concat_videos(parts, output_path)
+            return output_path
+        finally:
+            for section_file in section_files:
+                (self.scripts_dir / section_file).unlink(missing_ok=True)
+                self.cleanup_media_files(section_file)
+
+    def find_generated_video(self, script_filename: str, scene_name: str, quality: Optional[str] = None) -> Path:
+        base_name = script_filename.replace('.py', '')
+        video_path = (self.scripts_dir / "media" / "videos" /
+                     base_name / (quality or self.quality) / f"{scene_name}.mp4")
+        if video_path.exists():
+            return video_path
 
         media_dir = self.scripts_dir / "media" / "videos" / base_name
         if media_dir.exists():
@@ -136,33 +260,51 @@ class ManimService:
         except Exception as e:
             print(f"Warning: Failed to delete media directory {media_dir}: {e}")
 
-    def generate_video(self, llm_code_response: str, timeout: int = 300) -> Tuple[str, bytes, float]:
+    @contextmanager
+    def generate_video(self, llm_code_response: str, timeout: int = 300, quality: Optional[str] = None) -> Iterator[RenderedVideo]:
+        """
+        Render the code at `quality` (default: the service quality) and yield the video file.
+
+        The media files are removed when the block exits, so callers should
+        upload or copy the video inside the block.
+        """
         try:
             # Extract and validate code
             code = self.extract_code_from_response(llm_code_response)
             scene_name = self.extract_scene_name(code)
+            self.validate_code(code, scene_name)
+        except ManimValidationError:
+            raise
+        except Exception as e:
+            raise ManimGenerationError(f"Video generation failed: {str(e)}") from e
 
-            with self.temporary_script(code) as (script_path, script_filename):
+        with self.temporary_script(code) as (script_path, script_filename):
+            try:
                 try:
-                    self.run_manim_docker(script_filename, scene_name, timeout)
-                    video_path = self.find_generated_video(script_filename, scene_name)
-                    file_size = video_path.stat().st_size
-                    size_mb = file_size / (1024 * 1024)
+                    if self.dry_run_enabled:
+                        self.dry_run(script_filename, scene_name, timeout)
+                    video_path = None
+                    sections = self.plan_sections(code, scene_name)
+                    if sections:
+                        try:
+                            video_path = self.render_sections(code, script_filename, scene_name, sections, timeout, quality)
+                        except ManimGenerationError:
+                            raise
+                        except Exception as e:
+                            print(f"Warning: Section render failed, rendering in one pass: {e}")
+                    if video_path is None:
+                        self.run_manim(script_filename, scene_name, timeout, quality)
+                        video_path = self.find_generated_video(script_filename, scene_name, quality)
+                    video = RenderedVideo(video_path)
+                    size_mb = video.size / (1024 * 1024)
                     if size_mb > 10.0:
                         raise ManimGenerationError(
                             f"Generated video is too large: {size_mb:.2f}MB > {10.0}MB"
                         )
-                    with open(video_path, 'rb') as video_file:
-                        video_bytes = video_file.read()
-                        video_b64 = base64.b64encode(video_bytes).decode('utf-8')
-                    result = subprocess.run([
-                            'ffprobe', '-v', 'quiet', '-show_entries',
-                            'format=duration', '-of', 'csv=p=0', str(video_path)
-                        ], capture_output=True, text=True)
-                    duration = float(result.stdout.strip())
-                    return video_b64, video_bytes, duration
-                finally:
-                    self.cleanup_media_files(script_filename)
-
-        except Exception as e:
-            raise ManimGenerationError(f"Video generation failed: {str(e)}") from e
+                except ManimValidationError:
+                    raise
+                except Exception as e:
+                    raise ManimGenerationError(f"Video generation failed: {str(e)}") from e
+                yield video
+            finally:
+                self.cleanup_media_files(script_filename)
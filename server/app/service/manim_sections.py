@@ -0,0 +1,109 @@
+import ast
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Scene methods that advance the animation counter used by `manim -n`
+ANIMATION_METHODS = {"play", "wait", "wait_until", "pause", "move_camera"}
+# Scene methods whose effect would be lost or duplicated when a range of animations is skipped
+UNSAFE_METHODS = {"add_sound", "interactive_embed", "embed"}
+
+
+def _self_method(node: ast.AST) -> Optional[str]:
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+    ):
+        return node.func.attr
+    return None
+
+
+def _constant(node: Optional[ast.AST], default: float) -> float:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    return default
+
+
+def _estimated_run_time(call: ast.Call) -> float:
+    run_time = next((kw.value for kw in call.keywords if kw.arg in ("run_time", "duration")), None)
+    if run_time is None and call.func.attr == "wait" and call.args:
+        run_time = call.args[0]
+    return _constant(run_time, 1.0)
+
+
+def find_animation_weights(code: str, scene_name: str) -> Optional[List[float]]:
+    """
+    Estimated run time of each animation in the scene, or None when it cannot be split safely.
+
+    Splitting is only safe when every animation is a plain top-level statement of
+    construct(): then the count is static and each section can fast-forward to its
+    start by running construct() with the earlier animations skipped.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    scene = next((n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == scene_name), None)
+    if scene is None:
+        return None
+    helpers = {n.name for n in scene.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    construct = next((n for n in scene.body if isinstance(n, ast.FunctionDef) and n.name == "construct"), None)
+    if construct is None:
+        return None
+
+    top_level = set()
+    weights = []
+    for statement in construct.body:
+        method = _self_method(statement.value) if isinstance(statement, ast.Expr) else None
+        if method in ANIMATION_METHODS:
+            top_level.add(id(statement.value))
+            weights.append(_estimated_run_time(statement.value))
+
+    for node in ast.walk(scene):
+        method = _self_method(node)
+        if method is None:
+            continue
+        if method in UNSAFE_METHODS or (method in helpers and method != "construct"):
+            return None
+        if method in ANIMATION_METHODS and id(node) not in top_level:
+            # Inside a loop, branch, helper or expression: the count is not static
+            return None
+    return weights
+
+
+def plan_sections(weights: List[float], max_sections: int, min_animations: int) -> List[Tuple[int, int]]:
+    """Split animation indices into contiguous inclusive ranges of roughly equal run time."""
+    count = min(max_sections, len(weights) // max(1, min_animations))
+    if count < 2:
+        return []
+    target = sum(weights) / count
+    sections = []
+    start, elapsed = 0, 0.0
+    for index, weight in enumerate(weights):
+        elapsed += weight
+        remaining_sections = count - len(sections) - 1
+        remaining_animations = len(weights) - index - 1
+        if remaining_sections and elapsed >= target * (len(sections) + 1) and remaining_animations >= remaining_sections:
+            sections.append((start, index))
+            start = index + 1
+    sections.append((start, len(weights) - 1))
+    return sections
+
+
+def concat_videos(paths: List[Path], output_path: Path) -> None:
+    """Join section renders with the concat demuxer; the sections share encoder settings, so streams are copied."""
+    list_path = output_path.with_suffix(".txt")
+    list_path.write_text("".join(f"file '{path.resolve()}'\n" for path in paths), encoding="utf-8")
+    try:
+        result = subprocess.run([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-i', str(list_path),
+            '-c', 'copy', '-movflags', '+faststart',
+            str(output_path)
+        ], capture_output=True, text=True)
+    finally:
+        list_path.unlink(missing_ok=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Concatenating sections failed: {result.stderr.strip()}")
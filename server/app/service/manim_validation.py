@@ -0,0 +1,104 @@
+import ast
+import re
+from typing import Iterable, List, Optional
+
+# Builtins that would let generated code reach past the import allowlist
+DISALLOWED_NAMES = {
+    "__import__", "__builtins__", "exec", "eval", "compile", "open", "globals", "locals", "vars", "breakpoint",
+}
+# Dunder attributes that ordinary scene code uses; any other dunder access is flagged
+ALLOWED_DUNDER_ATTRIBUTES = {"__init__", "__name__"}
+DYNAMIC_ATTRIBUTE_CALLS = {"getattr", "setattr", "delattr", "hasattr"}
+
+
+class ValidationIssue:
+    """One problem found in generated code, with its line when known."""
+
+    def __init__(self, message: str, line: Optional[int] = None):
+        self.message = message
+        self.line = line
+
+    def to_dict(self) -> dict:
+        return {"line": self.line, "message": self.message}
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}" if self.line else self.message
+
+
+def _is_dunder(name: str) -> bool:
+    return len(name) > 4 and name.startswith("__") and name.endswith("__")
+
+
+def _is_scene_base(base: ast.expr) -> bool:
+    name = base.id if isinstance(base, ast.Name) else base.attr if isinstance(base, ast.Attribute) else ""
+    return name.endswith("Scene")
+
+
+def find_code_issues(code: str, allowed_imports: Iterable[str], scene_name: Optional[str] = None) -> List[ValidationIssue]:
+    """
+    Static checks run before rendering: syntax, a Scene subclass with construct, and imports.
+
+    This is a lint that rejects the obvious ways around the import allowlist
+    (dangerous builtins, dunder attribute access, computed getattr names), not
+    a sandbox; isolation comes from rendering in the container or worker.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [ValidationIssue(f"SyntaxError: {e.msg}", e.lineno)]
+
+    issues = []
+    allowed = set(allowed_imports)
+
+    scenes = [
+        node for node in tree.body
+        if isinstance(node, ast.ClassDef) and any(_is_scene_base(base) for base in node.bases)
+    ]
+    if not scenes:
+        issues.append(ValidationIssue("No class deriving from Scene was found"))
+    elif scene_name and scene_name not in {scene.name for scene in scenes}:
+        issues.append(ValidationIssue(f"Scene class '{scene_name}' was not found"))
+    for scene in scenes:
+        if not any(isinstance(item, ast.FunctionDef) and item.name == "construct" for item in scene.body):
+            issues.append(ValidationIssue(f"Scene '{scene.name}' has no construct(self) method", scene.lineno))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""] if node.level == 0 else ["." * node.level + (node.module or "")]
+        elif isinstance(node, ast.Name) and node.id in DISALLOWED_NAMES:
+            # Any reference, not only a call: `run = exec` would otherwise slip through
+            issues.append(ValidationIssue(f"Use of {node.id} is not allowed", node.lineno))
+            continue
+        elif isinstance(node, ast.Attribute) and _is_dunder(node.attr) and node.attr not in ALLOWED_DUNDER_ATTRIBUTES:
+            issues.append(ValidationIssue(f"Access to attribute {node.attr} is not allowed", node.lineno))
+            continue
+        elif (
+            isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in DYNAMIC_ATTRIBUTE_CALLS and len(node.args) >= 2
+        ):
+            name = node.args[1]
+            if not (isinstance(name, ast.Constant) and isinstance(name.value, str)):
+                issues.append(ValidationIssue(f"{node.func.id}() with a computed attribute name is not allowed", node.lineno))
+            elif _is_dunder(name.value) and name.value not in ALLOWED_DUNDER_ATTRIBUTES:
+                issues.append(ValidationIssue(f"Access to attribute {name.value} is not allowed", node.lineno))
+            continue
+        else:
+            continue
+        for module in modules:
+            if module.split(".")[0] not in allowed:
+                issues.append(ValidationIssue(f"Import of '{module}' is not allowed", node.lineno))
+
+    return issues
+
+
+def issues_from_render_output(output: str, script_filename: str) -> List[ValidationIssue]:
+    """Turn a Python traceback from a dry run into an issue pointing at the script line."""
+    lines = [line.strip() for line in output.strip().splitlines() if line.strip()]
+    if not lines:
+        return [ValidationIssue("Dry run failed without output")]
+    line_numbers = re.findall(rf'{re.escape(script_filename)}", line (\d+)', output)
+    error_lines = [line for line in lines if re.match(r"^\w+(Error|Exception)\b", line)]
+    message = error_lines[-1] if error_lines else lines[-1]
+    return [ValidationIssue(message, int(line_numbers[-1]) if line_numbers else None)]
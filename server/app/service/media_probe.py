@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.core.cache import TTLCache
+
+
+class MediaProbeError(Exception):
+    """Custom exception for media probing errors"""
+    pass
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    if not rate:
+        return 0.0
+    num, _, den = rate.partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+class MediaInfo:
+    """Format and stream metadata of one media file, as reported by ffprobe."""
+
+    def __init__(self, format: dict, streams: list):
+        self.format = format
+        self.streams = streams
+
+    def _first_stream(self, codec_type: str) -> Optional[dict]:
+        return next((s for s in self.streams if s.get("codec_type") == codec_type), None)
+
+    @property
+    def video_stream(self) -> Optional[dict]:
+        return self._first_stream("video")
+
+    @property
+    def audio_stream(self) -> Optional[dict]:
+        return self._first_stream("audio")
+
+    @property
+    def duration(self) -> float:
+        if self.format.get("duration") is not None:
+            return float(self.format["duration"])
+        durations = [float(s["duration"]) for s in self.streams if s.get("duration") is not None]
+        return max(durations, default=0.0)
+
+    @property
+    def video_duration(self) -> float:
+        stream = self.video_stream
+        if stream and stream.get("duration") is not None:
+            return float(stream["duration"])
+        return self.duration
+
+    @property
+    def fps(self) -> float:
+        stream = self.video_stream
+        if not stream:
+            return 0.0
+        return _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+
+
+class MediaProbe:
+    """
+    Media metadata with one ffprobe call per file.
+
+    Results are cached by (path, mtime, size).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self._cache = TTLCache(max_entries=max_entries)
+        self._binaries_checked = False
+        self._binaries_available = False
+        self._lock = threading.Lock()
+
+    def check_binaries(self) -> bool:
+        """Check that ffmpeg and ffprobe run; the result is remembered for the process lifetime."""
+        with self._lock:
+            if not self._binaries_checked:
+                try:
+                    subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+                    subprocess.run(['ffprobe', '-version'], capture_output=True, check=True)
+                    self._binaries_available = True
+                except (subprocess.CalledProcessError, FileNotFoundError):
+                    self._binaries_available = False
+                self._binaries_checked = True
+            return self._binaries_available
+
+    def require_binaries(self) -> None:
+        if not self.check_binaries():
+            raise FileNotFoundError("FFmpeg or FFprobe not found. Please install FFmpeg on your system.")
+
+    def probe(self, path) -> MediaInfo:
+        path = Path(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise MediaProbeError(f"Media file not found: {path}") from e
+        key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        info = self._cache.get(key)
+        if info is None:
+            info = self._run_ffprobe(path)
+            self._cache.set(key, info)
+        return info
+
+    def probe_url(self, url: str) -> MediaInfo:
+        """Probe a remote source over HTTP; not cached, since the object behind a URL can change."""
+        return self._run_ffprobe(url)
+
+    def _run_ffprobe(self, path) -> MediaInfo:
+        self.require_binaries()
+        result = subprocess.run([
+            'ffprobe', '-v', 'quiet', '-print_format', 'json',
+            '-show_format', '-show_streams', str(path)
+        ], capture_output=True, text=True)
+        try:
+            data = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            data = {}
+        if result.returncode != 0 or "format" not in data:
+            raise MediaProbeError(f"Could not probe media file: {path}")
+        return MediaInfo(format=data["format"], streams=data.get("streams", []))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+media_probe = MediaProbe()
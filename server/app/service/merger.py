@@ -1,22 +1,36 @@
+import math
 import uuid
 import boto3
 import os
 import tempfile
-import cv2
 import subprocess
+import threading
 from urllib.parse import urlparse
 from botocore.exceptions import NoCredentialsError, ClientError
 from app.core.config import settings
+from app.service.media_probe import media_probe
+from app.service.source_cache import source_video_cache
+
+# ffprobe H.264 profile names -> x264 --profile; profiles x264 cannot encode are left out
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 10 Intra": "high10",
+    "High 4:2:2": "high422",
+    "High 4:2:2 Intra": "high422",
+    "High 4:4:4": "high444",
+    "High 4:4:4 Predictive": "high444",
+    "High 4:4:4 Intra": "high444",
+    "CAVLC 4:4:4": "high444",
+}
 
 class VideoAudioMerger:
     @staticmethod
     def check_ffmpeg_installation():
-        try:
-            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-            subprocess.run(['ffprobe', '-version'], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        return media_probe.check_binaries()
 
     @staticmethod
     def _parse_s3_url(s3_video_url):
@@ -37,24 +51,165 @@ class VideoAudioMerger:
         return bucket_name, s3_key
 
     @staticmethod
-    def _get_audio_duration(audio_file_path):
-        """Get the duration of an audio file using ffprobe."""
-        audio_info_cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_entries', 'format=duration', audio_file_path
+    def _audio_input(sample_rate, channels, sample_width):
+        return [
+            '-f', f's{sample_width * 8}le', '-ar', str(sample_rate), '-ac', str(channels),
+            '-i', 'pipe:0',
         ]
-        try:
-            result = subprocess.run(audio_info_cmd, capture_output=True, text=True, check=True)
-            import json
-            data = json.loads(result.stdout)
-            return float(data['format']['duration'])
-        except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError):
-            raise Exception(f"Could not determine duration of audio file: {audio_file_path}")
+
+    @staticmethod
+    def _x264_args():
+        args = ['-c:v', 'libx264', '-preset', settings.merge_x264_preset]
+        if settings.merge_x264_threads:
+            args += ['-threads', str(settings.merge_x264_threads)]
+        return args
+
+    @classmethod
+    def _encode_tail(cls, source, video_info, pad_duration, tail_path):
+        """Encode the last frame held for `pad_duration` seconds, matching the source stream; False on failure."""
+        stream = video_info.video_stream
+        fps = video_info.fps or 30
+        frame_rate = stream.get('r_frame_rate') or '30/1'
+        frames = max(1, math.ceil(pad_duration * fps))
+        cmd = [
+            'ffmpeg',
+            '-sseof', f'-{max(3 / fps, 0.2):.3f}',
+            '-i', source,
+            # Keep only the final frame and repeat it; only these frames get encoded
+            '-vf', f'reverse,trim=end_frame=1,loop=loop={frames - 1}:size=1:start=0,'
+                   f'setpts=N/({frame_rate})/TB',
+            '-r', frame_rate,
+            '-an',
+            *cls._x264_args(),
+            '-pix_fmt', stream.get('pix_fmt', 'yuv420p'),
+            # In-band SPS/PPS so players decode the tail even though the muxer keeps the source's headers
+            '-x264-params', 'repeat-headers=1',
+            '-video_track_timescale', stream.get('time_base', '1/15360').split('/')[-1],
+            '-y',
+            tail_path
+        ]
+        profile = X264_PROFILES.get(stream.get('profile'))
+        if profile:
+            cmd[cmd.index('-pix_fmt'):cmd.index('-pix_fmt')] = ['-profile:v', profile]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', errors='replace')
+            print(f"Warning: Freeze-frame tail encode failed, re-encoding the whole video instead: {stderr[-500:]}")
+            return False
+        return True
 
     @classmethod
-    def merge_video_with_audio(cls, s3_video_url, audio_file_path, output_path=None):
-        if not os.path.exists(audio_file_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
+    def _video_input(cls, source, video_info, audio_duration, workdir):
+        """
+        ffmpeg input for the video padded to the narration length; returns (args, needs re-encode).
+
+        With the concat strategy the original frames are stream-copied and only a
+        short freeze-frame tail is encoded; the tpad strategy re-encodes everything.
+        """
+        video_duration = video_info.video_duration
+        if audio_duration <= video_duration:
+            return ['-i', source], False
+        if settings.merge_pad_strategy == "concat" and video_info.video_stream.get('codec_name') == 'h264':
+            tail_path = os.path.join(workdir, 'tail.mp4')
+            if cls._encode_tail(source, video_info, audio_duration - video_duration, tail_path):
+                if '://' not in source:
+                    source = os.path.abspath(source)
+                list_path = os.path.join(workdir, 'concat.txt')
+                with open(list_path, 'w', encoding='utf-8') as concat_list:
+                    concat_list.write(f"file '{source}'\nduration {video_duration}\nfile '{tail_path}'\n")
+                return [
+                    '-f', 'concat', '-safe', '0',
+                    '-protocol_whitelist', 'file,http,https,tcp,tls,crypto',
+                    '-i', list_path,
+                ], False
+        return ['-i', source], True
+
+    @classmethod
+    def _build_ffmpeg_cmd(cls, video_input, audio_input, video_info, audio_duration, reencode, output_path, output_args=()):
+        video_duration = video_info.video_duration
+        if reencode:
+            return [
+                'ffmpeg',
+                *video_input,
+                *audio_input,
+                '-filter_complex',
+                f'[0:v]tpad=stop_mode=clone:stop_duration={audio_duration - video_duration}[extended_video];'
+                f'[extended_video]fps={video_info.fps}[final_video]',
+                '-map', '[final_video]',
+                '-map', '1:a',
+                *cls._x264_args(),
+                '-c:a', 'aac',
+                '-b:a', '128k',
+                '-ar', '44100',
+                '-ac', '2',
+                '-t', str(audio_duration),
+                '-avoid_negative_ts', 'make_zero',
+                '-fflags', '+genpts',
+                '-y',
+                *output_args,
+                output_path
+            ]
+        else:
+            return [
+                'ffmpeg',
+                *video_input,
+                *audio_input,
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '128k',
+                '-ar', '44100',
+                '-ac', '2',
+                '-filter_complex', '[1:a]apad[padded_audio]',
+                '-map', '0:v',
+                '-map', '[padded_audio]',
+                '-t', str(max(video_duration, audio_duration)),
+                '-avoid_negative_ts', 'make_zero',
+                '-fflags', '+genpts',
+                '-y',
+                *output_args,
+                output_path
+            ]
+
+    @classmethod
+    def _prepare_command(cls, source, video_info, audio_pcm, output_path, workdir,
+                         sample_rate, channels, sample_width, output_args=()):
+        """Returns (ffmpeg command, output duration); the output is cut with -t, so no probe is needed."""
+        if video_info.video_stream is None:
+            raise Exception("Failed to open source video")
+        audio_duration = len(audio_pcm) / (sample_rate * channels * sample_width)
+        video_input, reencode = cls._video_input(source, video_info, audio_duration, workdir)
+        ffmpeg_cmd = cls._build_ffmpeg_cmd(
+            video_input,
+            cls._audio_input(sample_rate, channels, sample_width),
+            video_info,
+            audio_duration,
+            reencode,
+            output_path,
+            output_args,
+        )
+        return ffmpeg_cmd, max(video_info.video_duration, audio_duration)
+
+    @classmethod
+    def merge_local(cls, source, audio_pcm: bytes, output_path, sample_rate=24000, channels=1, sample_width=2):
+        """Merge PCM narration into a local video file; returns the output duration in seconds."""
+        with tempfile.TemporaryDirectory(prefix='merge_') as workdir:
+            ffmpeg_cmd, final_duration = cls._prepare_command(
+                source, media_probe.probe(source), audio_pcm, output_path, workdir,
+                sample_rate, channels, sample_width,
+            )
+            subprocess.run(ffmpeg_cmd, input=audio_pcm, capture_output=True, check=True)
+        return final_duration
+
+    @classmethod
+    def merge_video_with_audio(cls, s3_video_url, audio_pcm: bytes, output_path=None,
+                               sample_rate=24000, channels=1, sample_width=2):
+        """
+        Merge raw s16le narration PCM into the S3 video; returns (output_path, duration in seconds).
+
+        The PCM is piped to ffmpeg on stdin, so no audio file is written or probed.
+        """
+        if not audio_pcm:
+            raise ValueError("Audio data is empty")
         if not s3_video_url.startswith('https://'):
             raise ValueError("S3 URL must start with 'https://'")
         if not cls.check_ffmpeg_installation():
@@ -77,73 +232,10 @@ class VideoAudioMerger:
         try:
             s3_client.download_file(bucket_name, s3_key, temp_video_path)
 
-            cap = cv2.VideoCapture(temp_video_path)
-            if not cap.isOpened():
-                raise Exception("Failed to open downloaded video file")
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            video_duration = total_frames / fps if fps > 0 else 0
-            cap.release()
-
-            audio_info_cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', audio_file_path]
-            try:
-                subprocess.run(audio_info_cmd, capture_output=True, text=True, check=True)
-            except subprocess.CalledProcessError:
-                raise Exception(f"Invalid audio file: {audio_file_path}")
-
-            audio_duration = cls._get_audio_duration(audio_file_path)
-
-            final_duration = max(video_duration, audio_duration)
-
-            if audio_duration > video_duration:
-                ffmpeg_cmd = [
-                    'ffmpeg',
-                    '-i', temp_video_path,
-                    '-i', audio_file_path,
-                    '-filter_complex',
-                    f'[0:v]tpad=stop_mode=clone:stop_duration={audio_duration - video_duration}[extended_video];'
-                    f'[extended_video]fps={fps}[final_video]',
-                    '-map', '[final_video]',
-                    '-map', '1:a',
-                    '-c:v', 'libx264',
-                    '-c:a', 'aac',
-                    '-b:a', '128k',
-                    '-ar', '44100',
-                    '-ac', '2',
-                    '-t', str(audio_duration),
-                    '-avoid_negative_ts', 'make_zero',
-                    '-fflags', '+genpts',
-                    '-y',
-                    output_path
-                ]
-            else:
-                ffmpeg_cmd = [
-                    'ffmpeg',
-                    '-i', temp_video_path,
-                    '-i', audio_file_path,
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    '-b:a', '128k',
-                    '-ar', '44100',
-                    '-ac', '2',
-                    '-filter_complex', '[1:a]apad[padded_audio]',
-                    '-map', '0:v',
-                    '-map', '[padded_audio]',
-                    '-t', str(video_duration),
-                    '-avoid_negative_ts', 'make_zero',
-                    '-fflags', '+genpts',
-                    '-y',
-                    output_path
-                ]
-
-            result = subprocess.run(
-                ffmpeg_cmd,
-                capture_output=True,
-                text=True,
-                check=True
+            final_duration = cls.merge_local(
+                temp_video_path, audio_pcm, output_path, sample_rate, channels, sample_width
             )
-
-            return output_path
+            return output_path, final_duration
 
         except NoCredentialsError:
             raise NoCredentialsError("AWS credentials not found. Please configure your credentials.")
@@ -156,9 +248,74 @@ class VideoAudioMerger:
             else:
                 raise e
         except subprocess.CalledProcessError as e:
-            raise Exception(f"FFmpeg error: {e.stderr}")
+            raise Exception(f"FFmpeg error: {e.stderr.decode('utf-8', errors='replace')}")
         except Exception as e:
             raise Exception(f"Error during video processing: {str(e)}")
         finally:
             if os.path.exists(temp_video_path):
                 os.unlink(temp_video_path)
+
+    @classmethod
+    def merge_and_upload(cls, s3_video_url, audio_pcm: bytes, upload_service,
+                         sample_rate=24000, channels=1, sample_width=2):
+        """
+        Streaming merge; returns (updated video URL, duration in seconds).
+
+        ffmpeg reads the source from the local source cache or a presigned URL
+        and writes fragmented MP4 to a pipe that is uploaded as it is produced,
+        so download, mux and upload overlap. The output goes to a staging key
+        and only replaces the original once ffmpeg has succeeded.
+        """
+        if not audio_pcm:
+            raise ValueError("Audio data is empty")
+        media_probe.require_binaries()
+
+        bucket_name, s3_key = upload_service.parse_s3_url(s3_video_url)
+        local_source = source_video_cache.path(s3_video_url) if source_video_cache is not None else None
+        if local_source is not None:
+            source = str(local_source)
+            video_info = media_probe.probe(local_source)
+        else:
+            source = upload_service.generate_presigned_url(bucket_name, s3_key, settings.presign_expires_seconds)
+            video_info = media_probe.probe_url(source)
+        with tempfile.TemporaryDirectory(prefix='merge_') as workdir:
+            ffmpeg_cmd, final_duration = cls._prepare_command(
+                source, video_info, audio_pcm, 'pipe:1', workdir,
+                sample_rate, channels, sample_width,
+                output_args=['-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4'],
+            )
+
+            staging_key = f"{s3_key}.{uuid.uuid4().hex[:8]}.partial"
+            process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stderr = []
+
+            def feed_audio():
+                try:
+                    process.stdin.write(audio_pcm)
+                except BrokenPipeError:
+                    pass
+                finally:
+                    process.stdin.close()
+
+            threads = [
+                threading.Thread(target=feed_audio, daemon=True),
+                threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True),
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                upload_service.upload_stream(process.stdout, bucket_name, staging_key)
+            except Exception:
+                process.kill()
+                raise
+            finally:
+                process.wait()
+                for thread in threads:
+                    thread.join()
+
+            if process.returncode != 0:
+                upload_service.delete_object(bucket_name, staging_key)
+                raise Exception(f"FFmpeg error: {b''.join(stderr).decode('utf-8', errors='replace')}")
+
+        updated_url = upload_service.promote_object(bucket_name, staging_key, s3_video_url)
+        return updated_url, final_duration
@@ -0,0 +1,45 @@
+import time
+from typing import Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.service.upload import S3UploadService
+
+
+class PresignedUrlCache:
+    """
+    Presigned GET URLs per (bucket, key, user), reused until shortly before they expire.
+
+    Signing is local CPU work in boto3, but caching keeps the URL stable so
+    browsers can reuse their own cache of the redirect and the video bytes.
+    """
+
+    def __init__(self, upload_service: S3UploadService, expires_seconds: int, refresh_margin_seconds: int):
+        self.upload_service = upload_service
+        self.expires_seconds = expires_seconds
+        self.refresh_margin_seconds = min(refresh_margin_seconds, expires_seconds // 2)
+        self._cache = TTLCache(
+            max_entries=4096,
+            ttl_seconds=expires_seconds - self.refresh_margin_seconds,
+        )
+
+    def get(self, bucket: str, key: str, subject: Optional[str]) -> Tuple[str, int]:
+        """Return (url, seconds the URL stays usable before a fresh one is signed)."""
+        cache_key = (bucket, key, subject)
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            url = self.upload_service.generate_presigned_url(bucket, key, self.expires_seconds)
+            entry = (url, time.monotonic() + self.expires_seconds - self.refresh_margin_seconds)
+            self._cache.set(cache_key, entry)
+        url, refresh_at = entry
+        return url, max(0, int(refresh_at - time.monotonic()))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+presigned_url_cache = PresignedUrlCache(
+    S3UploadService(),
+    expires_seconds=settings.presign_expires_seconds,
+    refresh_margin_seconds=settings.presign_refresh_margin_seconds,
+)
@@ -0,0 +1,108 @@
+from typing import Iterator, List
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+
+from app.core.cache import DiskLRUCache, TTLCache
+from app.core.config import settings
+from app.service.upload import ObjectChangedError, S3UploadService
+
+
+class S3RangeCache:
+    """
+    Local cache of S3 objects in aligned blocks for ranged video streaming.
+
+    Blocks are keyed by bucket, key, ETag and block index, and every GET is
+    conditional on the cached ETag, so bytes of a replaced object are never
+    stored under the old version. Cold blocks are fetched in runs of up to
+    `read_size` bytes per GET.
+    """
+
+    def __init__(self, s3, disk_cache: DiskLRUCache, block_size: int, read_size: int, head_ttl_seconds: float):
+        self.s3 = s3
+        self.disk_cache = disk_cache
+        self.block_size = block_size
+        self.blocks_per_read = max(1, read_size // block_size)
+        self._heads = TTLCache(max_entries=1024, ttl_seconds=head_ttl_seconds)
+
+    def head(self, bucket: str, key: str) -> dict:
+        meta = self._heads.get((bucket, key))
+        if meta is None:
+            try:
+                response = self.s3.head_object(Bucket=bucket, Key=key)
+            except ClientError as e:
+                raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
+            meta = {"size": response["ContentLength"], "etag": response.get("ETag", "").strip('"')}
+            self._heads.set((bucket, key), meta)
+        return meta
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        self._heads.pop((bucket, key))
+
+    def _block_key(self, bucket: str, key: str, etag: str, index: int) -> str:
+        return f"{bucket}/{key}/{etag}/{self.block_size}/{index}"
+
+    def _fetch_blocks(self, bucket: str, key: str, meta: dict, first: int, count: int) -> List[bytes]:
+        start = first * self.block_size
+        end = min((first + count) * self.block_size, meta["size"]) - 1
+        conditions = {"IfMatch": f'"{meta["etag"]}"'} if meta["etag"] else {}
+        try:
+            response = self.s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **conditions)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "412"):
+                raise
+            # Replaced since the HEAD entry was cached: the next request sees the new object
+            self.invalidate(bucket, key)
+            raise ObjectChangedError(f"s3://{bucket}/{key} changed while it was being streamed") from e
+        body = response["Body"]
+        try:
+            data = body.read()
+        finally:
+            body.close()
+        blocks = []
+        for offset in range(0, len(data), self.block_size):
+            block = data[offset:offset + self.block_size]
+            self.disk_cache.set(self._block_key(bucket, key, meta["etag"], first + len(blocks)), block)
+            blocks.append(block)
+        return blocks
+
+    def iter_range(self, bucket: str, key: str, start: int, end: int) -> Iterator[bytes]:
+        """
+        Yield bytes start..end (inclusive), from local blocks where possible.
+
+        Raises ObjectChangedError when the object was replaced after its HEAD was
+        cached; the response headers already describe the old object, so the
+        stream is aborted rather than continued with bytes of the new one.
+        """
+        meta = self.head(bucket, key)
+        first, last = start // self.block_size, end // self.block_size
+        index = first
+        while index <= last:
+            block = self.disk_cache.get(self._block_key(bucket, key, meta["etag"], index))
+            if block is not None:
+                blocks = [block]
+            else:
+                # Read ahead over the following blocks too, up to the cold read size
+                count = min(self.blocks_per_read, last - index + 1)
+                blocks = self._fetch_blocks(bucket, key, meta, index, count)
+                if not blocks:
+                    return
+            for block in blocks:
+                block_start = index * self.block_size
+                lo = max(start - block_start, 0)
+                hi = min(end - block_start + 1, len(block))
+                if lo < hi:
+                    yield block[lo:hi]
+                index += 1
+
+    def stats(self) -> dict:
+        return {"blocks": self.disk_cache.stats(), "heads": self._heads.stats()}
+
+
+range_cache = S3RangeCache(
+    s3=S3UploadService().s3,
+    disk_cache=DiskLRUCache(settings.stream_cache_dir, settings.stream_cache_max_bytes),
+    block_size=settings.stream_cache_block_size,
+    read_size=settings.stream_read_size,
+    head_ttl_seconds=settings.stream_head_ttl_seconds,
+) if settings.stream_cache_enabled else None
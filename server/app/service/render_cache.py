@@ -0,0 +1,77 @@
+import hashlib
+import io
+import re
+import tokenize
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form of a script with comments and formatting whitespace removed."""
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+        parts = []
+        for token in tokens:
+            if token.type in _SKIPPED_TOKENS:
+                continue
+            if token.type == tokenize.NEWLINE:
+                parts.append("\n")
+            elif token.type == tokenize.INDENT:
+                parts.append("<indent>")
+            elif token.type == tokenize.DEDENT:
+                parts.append("<dedent>")
+            else:
+                parts.append(token.string)
+        return " ".join(parts)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        stripped = re.sub(r"#[^\n]*", "", code)
+        return re.sub(r"\s+", " ", stripped).strip()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of rendered videos.
+
+    Keys are hashes of the normalized Manim source plus the scene name, values
+    are the S3 URL and duration of a previous successful render.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = None):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def key(code: str, scene_name: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(scene_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalize_code(code).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._cache.get(key)
+
+    def put(self, key: str, s3_url: str, duration: float) -> None:
+        self._cache.set(key, {"s3_url": s3_url, "duration": duration})
+
+    def invalidate(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def invalidate_url(self, s3_url: str) -> None:
+        """Drop entries pointing at an S3 object that has been overwritten."""
+        target = s3_url.split("?")[0]
+        for key, entry in self._cache.items():
+            if entry["s3_url"].split("?")[0] == target:
+                self._cache.pop(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+render_cache = RenderCache(
+    max_entries=settings.render_cache_max_entries,
+    ttl_seconds=settings.render_cache_ttl_seconds,
+) if settings.render_cache_enabled else None
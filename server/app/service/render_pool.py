@@ -0,0 +1,384 @@
+import json
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from app.core.config import settings
+
+WORKER_SCRIPT = Path(__file__).with_name("render_worker.py")
+WORKER_SCRIPT_NAME = "_render_worker.py"
+
+
+class RenderWorkerError(Exception):
+    """Custom exception for render worker errors"""
+    pass
+
+class ManimRenderFailed(RenderWorkerError):
+    """The worker is healthy but the script failed to render"""
+    pass
+
+
+class SubprocessRenderBackend:
+    """Runs workers as local Python processes; requires manim in the local environment."""
+    name = "subprocess"
+
+    def __init__(self, python_executable: str = sys.executable):
+        self.python_executable = python_executable
+
+    def prepare(self, scripts_dir: Path) -> None:
+        # Run a copy so that app/service/manim.py cannot shadow the manim package
+        shutil.copyfile(WORKER_SCRIPT, scripts_dir / WORKER_SCRIPT_NAME)
+
+    def command(self, scripts_dir: Path, worker_id: str) -> List[str]:
+        return [self.python_executable, "-u", WORKER_SCRIPT_NAME]
+
+    def terminate(self, worker_id: str) -> None:
+        pass
+
+
+class DockerRenderBackend:
+    """Runs each worker as a long-lived container with the scripts directory mounted at /manim."""
+    name = "docker"
+
+    def __init__(self, docker_image: str = "manimcommunity/manim"):
+        self.docker_image = docker_image
+
+    def prepare(self, scripts_dir: Path) -> None:
+        shutil.copyfile(WORKER_SCRIPT, scripts_dir / WORKER_SCRIPT_NAME)
+
+    def command(self, scripts_dir: Path, worker_id: str) -> List[str]:
+        return [
+            "docker", "run", "-i", "--rm",
+            "--name", f"manim-worker-{worker_id}",
+            "-v", f"{scripts_dir.resolve()}:/manim",
+            "-w", "/manim",
+            self.docker_image,
+            "python", "-u", f"/manim/{WORKER_SCRIPT_NAME}",
+        ]
+
+    def terminate(self, worker_id: str) -> None:
+        subprocess.run(
+            ["docker", "rm", "-f", f"manim-worker-{worker_id}"],
+            capture_output=True,
+        )
+
+
+def create_render_backend(name: str, docker_image: str = "manimcommunity/manim"):
+    if name == "docker":
+        return DockerRenderBackend(docker_image)
+    if name == "subprocess":
+        return SubprocessRenderBackend()
+    raise ValueError(f"Unknown render pool backend: {name}")
+
+
+class RenderWorker:
+    def __init__(self, backend, scripts_dir: Path):
+        self.id = uuid.uuid4().hex[:8]
+        self.backend = backend
+        self.scripts_dir = scripts_dir
+        self.jobs_completed = 0
+        self.last_used = time.monotonic()
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[dict]" = queue.Queue()
+        self._output = deque(maxlen=200)
+
+    def start(self, startup_timeout: float) -> None:
+        try:
+            self._process = subprocess.Popen(
+                self.backend.command(self.scripts_dir, self.id),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                cwd=str(self.scripts_dir),
+            )
+        except FileNotFoundError as e:
+            raise RenderWorkerError(f"Failed to start {self.backend.name} render worker: {e}") from e
+
+        threading.Thread(target=self._read_responses, daemon=True).start()
+        threading.Thread(target=self._read_output, daemon=True).start()
+
+        try:
+            ready = self._wait_for("ready", startup_timeout)
+        except RenderWorkerError:
+            self.kill()
+            raise
+        if not ready.get("ok"):
+            self.kill()
+            raise RenderWorkerError(f"Render worker failed to start: {ready.get('error')}")
+
+    def _read_responses(self) -> None:
+        for line in self._process.stdout:
+            try:
+                self._responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                self._output.append(line)
+        self._responses.put({"op": "exit", "ok": False, "error": "Render worker exited"})
+
+    def _read_output(self) -> None:
+        for line in self._process.stderr:
+            self._output.append(line)
+
+    def _wait_for(self, op: str, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RenderWorkerError(f"Render worker did not answer '{op}' within {timeout:.0f} seconds")
+            try:
+                response = self._responses.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if response.get("op") == "exit":
+                raise RenderWorkerError(f"Render worker exited unexpectedly\n{self.recent_output()}")
+            if response.get("op") == op:
+                return response
+
+    def request(self, payload: dict, timeout: float) -> dict:
+        if not self.is_alive():
+            raise RenderWorkerError("Render worker is not running")
+        try:
+            self._process.stdin.write(json.dumps(payload) + "\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RenderWorkerError(f"Failed to send job to render worker: {e}") from e
+        self.last_used = time.monotonic()
+        return self._wait_for(payload["op"], timeout)
+
+    def ping(self, timeout: float = 5) -> bool:
+        try:
+            return bool(self.request({"op": "ping"}, timeout).get("ok"))
+        except RenderWorkerError:
+            return False
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def recent_output(self) -> str:
+        return "".join(self._output)
+
+    def clear_output(self) -> None:
+        self._output.clear()
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        if self.is_alive():
+            try:
+                self._process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                self._process.stdin.flush()
+                self._process.wait(timeout=5)
+            except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                self.kill()
+        self._process = None
+
+    def kill(self) -> None:
+        if self._process is None:
+            return
+        if self.is_alive():
+            self._process.kill()
+            self.backend.terminate(self.id)
+        self._process = None
+
+
+class RenderWorkerPool:
+    """
+    Pool of pre-warmed Manim render workers.
+
+    Workers import Manim once and then render many scripts, avoiding the
+    container start and import cost of a fresh `docker run` per request.
+    Each worker is recycled after `max_jobs_per_worker` renders, replaced on
+    timeout or crash, and pinged before reuse once it has been idle for
+    `health_check_interval` seconds. A background thread also pings the idle
+    workers on that interval, so a dead worker is replaced before a render needs it.
+    """
+
+    def __init__(
+        self,
+        backend,
+        scripts_dir: Path,
+        size: int = 2,
+        max_jobs_per_worker: int = 50,
+        health_check_interval: float = 30,
+        startup_timeout: float = 120,
+    ):
+        self.backend = backend
+        self.scripts_dir = Path(scripts_dir)
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self._idle: "queue.Queue[RenderWorker]" = queue.Queue()
+        self._workers = set()
+        self._starting = 0
+        self._lock = threading.Lock()
+        self._started = False
+        self._health_stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self.jobs_rendered = 0
+        self.workers_recycled = 0
+
+    def start(self) -> None:
+        self.scripts_dir.mkdir(parents=True, exist_ok=True)
+        self.backend.prepare(self.scripts_dir)
+        self._started = True
+        self._ensure_capacity()
+        with self._lock:
+            if self.health_check_interval > 0 and self._health_thread is None:
+                self._health_stop.clear()
+                self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        while not self._health_stop.wait(self.health_check_interval):
+            try:
+                result = self.health_check()
+            except Exception as e:
+                print(f"Warning: Render pool health check failed: {e}")
+                continue
+            if result["unhealthy"]:
+                print(f"Warning: Replaced {result['unhealthy']} unresponsive render worker(s)")
+
+    def _ensure_capacity(self) -> None:
+        with self._lock:
+            missing = self.size - len(self._workers) - self._starting
+            self._starting += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            threading.Thread(target=self._spawn_worker, daemon=True).start()
+
+    def _spawn_worker(self) -> None:
+        worker = RenderWorker(self.backend, self.scripts_dir)
+        try:
+            worker.start(self.startup_timeout)
+        except RenderWorkerError as e:
+            print(f"Warning: Failed to start render worker: {e}")
+            with self._lock:
+                self._starting -= 1
+            return
+        with self._lock:
+            self._starting -= 1
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker: RenderWorker) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+            self.workers_recycled += 1
+        threading.Thread(target=worker.stop, daemon=True).start()
+        self._ensure_capacity()
+
+    @contextmanager
+    def _checkout(self, timeout: float):
+        if not self._started:
+            self.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            self._ensure_capacity()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RenderWorkerError(f"No render worker became available within {timeout} seconds")
+            try:
+                worker = self._idle.get(timeout=min(remaining, 5))
+            except queue.Empty:
+                continue
+            idle_for = time.monotonic() - worker.last_used
+            if not worker.is_alive() or (idle_for > self.health_check_interval and not worker.ping()):
+                self._retire(worker)
+                continue
+            break
+
+        healthy = True
+        try:
+            yield worker
+        except ManimRenderFailed:
+            raise
+        except RenderWorkerError:
+            healthy = worker.is_alive() and worker.ping()
+            raise
+        finally:
+            if not healthy or worker.jobs_completed >= self.max_jobs_per_worker:
+                self._retire(worker)
+            else:
+                self._idle.put(worker)
+
+    def render(self, args: List[str], timeout: float = 300) -> str:
+        """Render with a pooled worker and return its console output."""
+        deadline = time.monotonic() + timeout
+        with self._checkout(timeout) as worker:
+            worker.clear_output()
+            remaining = max(deadline - time.monotonic(), 1)
+            try:
+                response = worker.request({"op": "render", "id": uuid.uuid4().hex, "args": args}, remaining)
+            except RenderWorkerError as e:
+                worker.kill()
+                raise RenderWorkerError(f"{e}\n{worker.recent_output()}") from e
+            worker.jobs_completed += 1
+            with self._lock:
+                self.jobs_rendered += 1
+            output = worker.recent_output()
+            if not response.get("ok"):
+                raise ManimRenderFailed(f"{response.get('error')}\n{output}")
+            return output
+
+    def health_check(self) -> dict:
+        """Ping every idle worker, replacing the ones that do not answer."""
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        unhealthy = 0
+        for worker in checked:
+            if worker.is_alive() and worker.ping():
+                self._idle.put(worker)
+            else:
+                unhealthy += 1
+                self._retire(worker)
+        return {**self.stats(), "unhealthy": unhealthy}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "size": self.size,
+                "workers": len(self._workers),
+                "starting": self._starting,
+                "idle": self._idle.qsize(),
+                "jobs_rendered": self.jobs_rendered,
+                "workers_recycled": self.workers_recycled,
+            }
+
+    def shutdown(self) -> None:
+        self._started = False
+        self._health_stop.set()
+        with self._lock:
+            self._health_thread = None
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for worker in workers:
+            worker.stop()
+
+
+render_pool = RenderWorkerPool(
+    backend=create_render_backend(settings.render_pool_backend, settings.docker_image),
+    scripts_dir=settings.scripts_dir,
+    size=settings.render_pool_size,
+    max_jobs_per_worker=settings.render_pool_max_jobs_per_worker,
+    health_check_interval=settings.render_pool_health_check_interval,
+) if settings.render_pool_enabled else None
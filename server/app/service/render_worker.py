@@ -0,0 +1,87 @@
+"""
+Long-lived Manim render worker.
+
+Runs either inside the Manim Docker image or as a local subprocess. Manim is
+imported once at startup, then render jobs are read as JSON lines from stdin
+and answered as JSON lines on the original stdout. Manim's own console output
+is redirected to stderr so it never interleaves with the protocol.
+
+This file must stay self-contained: it is copied next to the generated scripts
+and executed without the application package on the path.
+"""
+import json
+import os
+import sys
+import traceback
+
+
+def _open_protocol_channel():
+    protocol_fd = os.dup(1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    return os.fdopen(protocol_fd, "w", buffering=1, encoding="utf-8")
+
+
+def _send(channel, payload):
+    channel.write(json.dumps(payload) + "\n")
+    channel.flush()
+
+
+def _render(manim_main, tempconfig, args):
+    with tempconfig({}):
+        try:
+            manim_main.main(args=list(args), standalone_mode=False)
+        except SystemExit as e:
+            if e.code not in (0, None):
+                raise RuntimeError(f"manim exited with code {e.code}")
+
+
+def main():
+    channel = _open_protocol_channel()
+
+    try:
+        from manim import tempconfig
+        from manim.__main__ import main as manim_main
+    except Exception as e:
+        _send(channel, {"op": "ready", "ok": False, "error": f"Failed to import manim: {e}"})
+        return 1
+
+    _send(channel, {"op": "ready", "ok": True, "pid": os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            _send(channel, {"op": "error", "ok": False, "error": f"Invalid request: {e}"})
+            continue
+
+        op = request.get("op")
+        if op == "ping":
+            _send(channel, {"op": "ping", "ok": True})
+        elif op == "shutdown":
+            _send(channel, {"op": "shutdown", "ok": True})
+            break
+        elif op == "render":
+            try:
+                _render(manim_main, tempconfig, ["render", *request["args"]])
+                _send(channel, {"op": "render", "ok": True, "id": request.get("id")})
+            except Exception as e:
+                sys.stderr.write(traceback.format_exc())
+                sys.stderr.flush()
+                _send(channel, {
+                    "op": "render",
+                    "ok": False,
+                    "id": request.get("id"),
+                    "error": f"{type(e).__name__}: {e}",
+                })
+        else:
+            _send(channel, {"op": op, "ok": False, "error": f"Unknown op: {op}"})
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+from pathlib import Path
+from typing import Optional
+
+from app.core.cache import DiskLRUCache
+from app.core.config import settings
+
+
+class SourceVideoCache:
+    """
+    Local copies of recently rendered videos, keyed by their S3 URL without query.
+
+    Audio merges usually follow a render from the same server within minutes,
+    so the merge can read the source from disk instead of S3.
+    """
+
+    def __init__(self, store: DiskLRUCache):
+        self.store = store
+
+    @staticmethod
+    def key(s3_url: str) -> str:
+        return s3_url.split("?")[0]
+
+    def path(self, s3_url: str) -> Optional[Path]:
+        path = self.store.path(self.key(s3_url))
+        return path if path is not None and path.exists() else None
+
+    def put_file(self, s3_url: str, video_path: Path) -> None:
+        try:
+            self.store.set_file(self.key(s3_url), video_path)
+        except OSError as e:
+            print(f"Warning: Failed to cache source video {video_path}: {e}")
+
+    def invalidate(self, s3_url: str) -> None:
+        self.store.pop(self.key(s3_url))
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+source_video_cache = SourceVideoCache(
+    DiskLRUCache(settings.source_cache_dir, settings.source_cache_max_bytes)
+) if settings.source_cache_enabled else None
@@ -3,10 +3,30 @@ import boto3
 from urllib.parse import urlparse
 import re
 import time
-from botocore.exceptions import  ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import  BotoCoreError, ClientError
 from fastapi import HTTPException
 from app.core.config import settings
 import os
+from typing import Optional
+
+VIDEO_EXTRA_ARGS = {
+    "ContentType": "video/mp4",
+    "CacheControl": "no-cache, no-store, must-revalidate",
+    "Expires": "0"
+}
+
+# Multipart upload straight from disk: memory stays at a few chunks whatever the file size
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+
+class ObjectChangedError(RuntimeError):
+    """Custom exception for S3 objects replaced since their ETag was read"""
+    pass
 
 
 class S3UploadService:
@@ -28,17 +48,100 @@ class S3UploadService:
                 fileobj = io.BytesIO(video_data)
             else:
                 fileobj = video_data
-            self.s3.upload_fileobj(fileobj, self.bucket, s3_key, ExtraArgs={
-                        "ContentType": "video/mp4",
-                        "CacheControl": "no-cache, no-store, must-revalidate",
-                        "Expires": "0"
-                    })
+            self.s3.upload_fileobj(fileobj, self.bucket, s3_key, ExtraArgs=VIDEO_EXTRA_ARGS)
             timestamp = int(time.time())
             s3_url = f"https://{self.bucket}.s3.amazonaws.com/{s3_key}?v={timestamp}"
             return s3_url
         except Exception as e:
             raise RuntimeError(f"Failed to upload video to S3: {e}")
 
+    def upload_video_file(self, video_path, username: str, chat_id: int) -> str:
+        """Upload a rendered video from disk without loading it into memory."""
+        video_filename = f"video_{uuid.uuid4().hex[:8]}.mp4"
+        s3_key = f"{username}/{chat_id}/{video_filename}"
+        try:
+            self.s3.upload_file(
+                str(video_path), self.bucket, s3_key,
+                ExtraArgs=VIDEO_EXTRA_ARGS,
+                Config=TRANSFER_CONFIG,
+            )
+            timestamp = int(time.time())
+            return f"https://{self.bucket}.s3.amazonaws.com/{s3_key}?v={timestamp}"
+        except Exception as e:
+            raise RuntimeError(f"Failed to upload video to S3: {e}")
+
+    def generate_presigned_url(self, bucket: str, key: str, expires_in: int) -> str:
+        try:
+            return self.s3.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": bucket, "Key": key, "ResponseContentType": "video/mp4"},
+                ExpiresIn=expires_in,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to presign video URL: {e}")
+
+    def upload_stream(self, fileobj, bucket: str, key: str) -> None:
+        """Multipart upload from a non-seekable stream such as a process pipe."""
+        try:
+            self.s3.upload_fileobj(fileobj, bucket, key, ExtraArgs=VIDEO_EXTRA_ARGS, Config=TRANSFER_CONFIG)
+        except Exception as e:
+            raise RuntimeError(f"Failed to upload video stream to S3: {e}")
+
+    def promote_object(self, bucket: str, staging_key: str, s3_url: str, if_match: Optional[str] = None) -> str:
+        """
+        Replace the video at `s3_url` with a staged object and remove the staging copy.
+
+        With `if_match` the copy is conditional on the target's current ETag and
+        raises ObjectChangedError if the target was replaced in the meantime.
+        """
+        target_bucket, target_key = self.parse_s3_url(s3_url)
+        conditions = {"IfMatch": if_match} if if_match else {}
+        try:
+            self.s3.copy_object(
+                Bucket=target_bucket,
+                Key=target_key,
+                CopySource={"Bucket": bucket, "Key": staging_key},
+                MetadataDirective="REPLACE",
+                ContentType="video/mp4",
+                CacheControl="no-cache, no-store, must-revalidate",
+                **conditions,
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "412"):
+                raise ObjectChangedError(f"s3://{target_bucket}/{target_key} changed before it could be replaced") from e
+            raise RuntimeError(f"Failed to update video in S3: {e}")
+        except Exception as e:
+            raise RuntimeError(f"Failed to update video in S3: {e}")
+        finally:
+            self.delete_object(bucket, staging_key)
+        timestamp = int(time.time())
+        return f"{s3_url}?v={timestamp}"
+
+    def delete_object(self, bucket: str, key: str) -> None:
+        try:
+            self.s3.delete_object(Bucket=bucket, Key=key)
+        except Exception as e:
+            print(f"Warning: Failed to delete s3://{bucket}/{key}: {e}")
+
+    def copy_video(self, s3_url: str, username: str, chat_id: int) -> str:
+        """Server-side copy of an existing video to a new key for this chat."""
+        source_bucket, source_key = self.parse_s3_url(s3_url)
+        video_filename = f"video_{uuid.uuid4().hex[:8]}.mp4"
+        s3_key = f"{username}/{chat_id}/{video_filename}"
+        try:
+            self.s3.copy_object(
+                Bucket=self.bucket,
+                Key=s3_key,
+                CopySource={"Bucket": source_bucket, "Key": source_key},
+                MetadataDirective="REPLACE",
+                ContentType="video/mp4",
+                CacheControl="no-cache, no-store, must-revalidate",
+            )
+            timestamp = int(time.time())
+            return f"https://{self.bucket}.s3.amazonaws.com/{s3_key}?v={timestamp}"
+        except Exception as e:
+            raise RuntimeError(f"Failed to copy video in S3: {e}")
+
     def parse_s3_url(self, s3_url: str) -> tuple[str, str]:
         # Remove query parameters (like cache-busting timestamps) before parsing
         clean_url = s3_url.split('?')[0]
@@ -62,6 +165,13 @@ class S3UploadService:
 
         return bucket, key
 
+    def get_etag(self, bucket: str, key: str) -> Optional[str]:
+        try:
+            return self.s3.head_object(Bucket=bucket, Key=key).get("ETag")
+        except (ClientError, BotoCoreError) as e:
+            print(f"Warning: Failed to read ETag of s3://{bucket}/{key}: {e}")
+            return None
+
     def get_file_size(self, bucket: str, key: str) -> int:
         try:
             response = self.s3.head_object(Bucket=bucket, Key=key)
@@ -77,17 +187,13 @@ class S3UploadService:
         except ValueError as e:
             raise ValueError(f"Invalid S3 URL: {e}")
         try:
-            with open(video_path, 'rb') as video_file:
-                self.s3.upload_fileobj(
-                    video_file,
-                    bucket,
-                    key,
-                    ExtraArgs={
-                        "ContentType": "video/mp4",
-                        "CacheControl": "no-cache, no-store, must-revalidate",
-                        "Expires": "0"
-                    }
-                )
+            self.s3.upload_file(
+                str(video_path),
+                bucket,
+                key,
+                ExtraArgs=VIDEO_EXTRA_ARGS,
+                Config=TRANSFER_CONFIG,
+            )
             timestamp = int(time.time())
             return f"{s3_url}?v={timestamp}"
         except FileNotFoundError:
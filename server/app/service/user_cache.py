@@ -0,0 +1,40 @@
+from typing import Hashable, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User
+
+
+class UserCache:
+    """
+    Authenticated users keyed by their token claims, so most requests skip the user lookup.
+
+    Entries are detached User rows. Writes through the user CRUD invalidate
+    them; the TTL bounds how long another process's change can go unseen.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def key(username: str, user_id: Optional[int] = None) -> Hashable:
+        return ("uid", user_id) if user_id is not None else ("sub", username)
+
+    def get(self, username: str, user_id: Optional[int] = None) -> Optional[User]:
+        return self._cache.get(self.key(username, user_id))
+
+    def put(self, user: User, username: str, user_id: Optional[int] = None) -> None:
+        self._cache.set(self.key(username, user_id), user)
+
+    def invalidate(self, user: User) -> None:
+        self._cache.pop(self.key(user.username, user.id))
+        self._cache.pop(self.key(user.username))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+user_cache = UserCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl_seconds=settings.user_cache_ttl_seconds,
+) if settings.user_cache_ttl_seconds > 0 else None
@@ -0,0 +1,128 @@
+"""
+Chat and history endpoint throughput while long generations hold the threadpool.
+
+Sync handlers run in FastAPI's threadpool (40 threads by default). Once slow
+work occupies those threads, every sync endpoint queues behind it. This
+compares the previous sync handlers with the async ones on the AsyncSession.
+It uses a throwaway SQLite database, so run it from the server directory with
+the usual .env present:
+
+    python -m benchmarks.async_endpoints_load --generations 40 --clients 20 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from fastapi.security import OAuth2PasswordBearer  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api.endpoints import chat, message  # noqa: E402
+from app.core.database import Base, SessionLocal, async_engine, engine, get_db, warm_async_engine  # noqa: E402
+from app.core.security import create_access_token, verify_token  # noqa: E402
+from app.crud import chat as chat_crud, message as message_crud, user as user_crud  # noqa: E402
+from app.schemas.chat import ChatCreate  # noqa: E402
+from app.schemas.message import MessageCreate  # noqa: E402
+from app.schemas.user import UserCreate  # noqa: E402
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def legacy_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # The dependency as it was: a sync lookup in the threadpool
+    return user_crud.get_user_by_username(db, verify_token(token, Exception("bad token")))
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chats")
+    app.include_router(message.router, prefix="/messages")
+
+    @app.get("/legacy/chats/user/{user_id}")
+    def legacy_chats(db: Session = Depends(get_db), current_user=Depends(legacy_current_user)):
+        return [c.id for c in chat_crud.get_chats_by_user_id(db, current_user.id)]
+
+    @app.get("/legacy/messages/chat/{chat_id}")
+    def legacy_messages(chat_id: int, db: Session = Depends(get_db), current_user=Depends(legacy_current_user)):
+        return [m.id for m in message_crud.get_messages_by_chat_id(db, chat_id)]
+
+    return app
+
+
+def seed(messages: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = user_crud.create_user(db, UserCreate(username="bench", password="bench"))
+        chat_id = chat_crud.create_chat(db, ChatCreate(title="bench"), user.id).id
+        for i in range(messages):
+            message_crud.create_message(db, MessageCreate(content=f"turn {i}", role="user", chat_id=chat_id))
+    return chat_id
+
+
+async def measure(app: FastAPI, path: str, token: str, generations: int, generation_seconds: float,
+                  clients: int, seconds: float) -> dict:
+    await warm_async_engine()
+    stop = time.perf_counter() + seconds
+    latencies = []
+
+    async def generation():
+        # A long render or upload offloaded to the threadpool
+        while time.perf_counter() < stop:
+            await run_in_threadpool(time.sleep, generation_seconds)
+
+    async def client_loop(client: httpx.AsyncClient):
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        background = [asyncio.create_task(generation()) for _ in range(generations)]
+        await asyncio.sleep(0.1)
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+        await asyncio.gather(*background)
+    # Pooled aiosqlite connections belong to this event loop
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--generations", type=int, default=40, help="concurrent long-running threadpool tasks")
+    parser.add_argument("--generation-seconds", type=float, default=2.0)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--messages", type=int, default=200, help="messages in the benchmark chat")
+    args = parser.parse_args()
+
+    chat_id = seed(args.messages)
+    token = create_access_token({"sub": "bench"})
+    app = build_app()
+    load = (args.generations, args.generation_seconds, args.clients, args.seconds)
+
+    for name, legacy_path, path in [
+        ("chat list", "/legacy/chats/user/1", "/chats/user/1"),
+        ("history", f"/legacy/messages/chat/{chat_id}", f"/messages/chat/{chat_id}"),
+    ]:
+        print(f"{name} sync: ", asyncio.run(measure(app, legacy_path, token, *load)))
+        print(f"{name} async:", asyncio.run(measure(app, path, token, *load)))
+
+
+if __name__ == "__main__":
+    main()
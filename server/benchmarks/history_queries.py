@@ -0,0 +1,116 @@
+"""
+Chat history queries on a large table, with and without the composite indexes.
+
+Seeds a throwaway SQLite database with many chats, then times the full
+history of one long chat and keyset pages through it. Run from the server
+directory with the usual .env present:
+
+    python -m benchmarks.history_queries --chats 2000 --messages 300
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.crud.message import get_messages_by_chat_id, get_messages_page
+from app.crud.video import get_videos_by_chat_id, get_videos_page
+from app.models import User, Chat, Message  # noqa: F401  (registers the tables)
+from app.models.video import Video
+
+
+def seed(engine, chats: int, messages: int) -> None:
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, created_at, updated_at) VALUES (1, 'bench', :ts, :ts)"), {"ts": start})
+        conn.execute(
+            text("INSERT INTO chats (id, title, user_id, created_at, updated_at) VALUES (:id, 't', 1, :ts, :ts)"),
+            [{"id": chat_id, "ts": start} for chat_id in range(1, chats + 1)],
+        )
+        # Interleave chats the way real traffic does, so one chat's rows are spread over the table
+        rows = [(chat_id, turn) for turn in range(messages) for chat_id in range(1, chats + 1)]
+        random.Random(0).shuffle(rows)
+        message_rows, video_rows = [], []
+        for row_id, (chat_id, turn) in enumerate(rows, start=1):
+            ts = start + timedelta(seconds=turn * 60 + chat_id % 60)
+            message_rows.append({"id": row_id, "chat_id": chat_id, "ts": ts})
+            if turn % 2:
+                video_rows.append({"id": row_id, "chat_id": chat_id, "message_id": row_id, "ts": ts})
+        conn.execute(
+            text("INSERT INTO messages (id, content, role, created_at, updated_at, chat_id) "
+                 "VALUES (:id, 'hello', 'user', :ts, :ts, :chat_id)"),
+            message_rows,
+        )
+        conn.execute(
+            text("INSERT INTO videos (id, created_at, updated_at, video_url, chat_id, message_id, duration) "
+                 "VALUES (:id, :ts, :ts, 's3://b/k.mp4', :chat_id, :message_id, 10)"),
+            video_rows,
+        )
+
+
+def drop_history_indexes(engine) -> None:
+    with engine.begin() as conn:
+        for table in (Message.__table__, Video.__table__):
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(session, chat_id: int, page_size: int, repeat: int) -> dict:
+    def walk(page_fn):
+        cursor = None
+        while True:
+            _, cursor = page_fn(session, chat_id, page_size, cursor)
+            if cursor is None:
+                break
+
+    return {
+        "messages (all)": timed(lambda: get_messages_by_chat_id(session, chat_id), repeat),
+        "messages (first page)": timed(lambda: get_messages_page(session, chat_id, page_size), repeat),
+        "messages (every page)": timed(lambda: walk(get_messages_page), repeat),
+        "videos (all)": timed(lambda: get_videos_by_chat_id(session, chat_id), repeat),
+        "videos (first page)": timed(lambda: get_videos_page(session, chat_id, page_size), repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=300, help="messages per chat")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.chats, args.messages)
+        session = sessionmaker(bind=engine)()
+        chat_id = args.chats // 2
+
+        with_indexes = run(session, chat_id, args.page_size, args.repeat)
+        session.close()
+        drop_history_indexes(engine)
+        session = sessionmaker(bind=engine)()
+        without_indexes = run(session, chat_id, args.page_size, args.repeat)
+        session.close()
+
+    print(f"{args.chats} chats x {args.messages} messages, page size {args.page_size}")
+    print(f"{'query':<24}{'no index (ms)':>16}{'indexed (ms)':>16}")
+    for name in with_indexes:
+        print(f"{name:<24}{without_indexes[name]:>16.2f}{with_indexes[name]:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Audio merge cost when the narration is longer than the video.
+
+Renders a synthetic H.264 clip with ffmpeg, then merges silent narration
+that overruns it using each padding strategy. Needs ffmpeg on PATH; run
+from the server directory with the usual .env present:
+
+    python -m benchmarks.merge_pad_strategies --video-seconds 20 --pad-seconds 10
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from app.core.config import settings
+from app.service.merger import VideoAudioMerger
+
+SAMPLE_RATE = 24000
+
+
+def make_source(path: str, seconds: float) -> None:
+    subprocess.run([
+        'ffmpeg', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-y', path,
+    ], capture_output=True, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video-seconds", type=float, default=20)
+    parser.add_argument("--pad-seconds", type=float, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    audio_pcm = bytes(int((args.video_seconds + args.pad_seconds) * SAMPLE_RATE) * 2)
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.mp4")
+        make_source(source, args.video_seconds)
+        for strategy in ("tpad", "concat"):
+            settings.merge_pad_strategy = strategy
+            timings = []
+            for run in range(args.runs):
+                output = os.path.join(workdir, f"{strategy}_{run}.mp4")
+                started = time.perf_counter()
+                duration = VideoAudioMerger.merge_local(source, audio_pcm, output, sample_rate=SAMPLE_RATE)
+                timings.append(time.perf_counter() - started)
+            print(f"{strategy:>6}: best {min(timings):.2f}s, mean {sum(timings) / len(timings):.2f}s, output {duration:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Concurrent /stream-video throughput against a simulated slow S3.
+
+Compares the previous handler (blocking boto3 calls inside the async
+endpoint) with the current one (threadpool-offloaded HEAD and prefetching
+body reads). Run from the server directory with the usual .env present:
+
+    python -m benchmarks.stream_throughput --streams 20 --size-mb 2
+"""
+import argparse
+import asyncio
+import io
+import re
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.endpoints import stream
+
+
+class SlowBody(io.BytesIO):
+    def __init__(self, data: bytes, latency: float):
+        super().__init__(data)
+        self.latency = latency
+
+    def read(self, size=-1):
+        time.sleep(self.latency)
+        return super().read(size)
+
+
+class SlowS3:
+    def __init__(self, size: int, latency: float):
+        self.data = bytes(size)
+        self.latency = latency
+
+    def head_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        return {"ContentLength": len(self.data), "ETag": '"bench"'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        time.sleep(self.latency)
+        start, end = 0, len(self.data) - 1
+        if Range:
+            start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", Range).groups())
+        return {"Body": SlowBody(self.data[start:end + 1], self.latency / 4)}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(stream.router)
+
+    @app.get("/legacy-stream-video")
+    async def legacy_stream_video(request: Request, s3_url: str):
+        # The handler as it was: blocking HEAD on the event loop, 8 KB sync reads
+        bucket, key = stream.upload_service.parse_s3_url(s3_url)
+        file_size = stream.upload_service.get_file_size(bucket, key)
+
+        def body():
+            response = stream.upload_service.s3.get_object(Bucket=bucket, Key=key)
+            while True:
+                chunk = response["Body"].read(8192)
+                if not chunk:
+                    break
+                yield chunk
+
+        return StreamingResponse(body(), headers={"Content-Length": str(file_size)}, media_type="video/mp4")
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, streams: int, **params) -> dict:
+    lags = []
+
+    async def ticker():
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - before - 0.01)
+
+    params = {"s3_url": "https://bench.s3.amazonaws.com/video.mp4", **params}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(path, params=params) for _ in range(streams)))
+        elapsed = time.perf_counter() - started
+        tick.cancel()
+
+    total = sum(len(r.content) for r in responses)
+    return {
+        "seconds": round(elapsed, 2),
+        "mb_per_s": round(total / elapsed / 1e6, 1),
+        "max_loop_lag_ms": round(max(lags, default=0) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated S3 latency per call in seconds")
+    args = parser.parse_args()
+
+    stream.upload_service.s3 = SlowS3(int(args.size_mb * 1024 * 1024), args.latency)
+    # Measure the S3 path itself; the block cache would hide the latency after the first stream
+    stream.range_cache = None
+    app = build_app()
+
+    print("before:", asyncio.run(measure(app, "/legacy-stream-video", args.streams)))
+    # Proxy mode explicitly: the default delivery mode answers with a presigned redirect
+    print("after: ", asyncio.run(measure(app, "/stream-video", args.streams, mode="proxy")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Tests for the summarized context window used to build code-generation prompts.
+
+Each test runs against its own SQLite database.
+Run with: python -m pytest test_context_window.py
+"""
+
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("LLM_API_KEY", "test")
+os.environ.setdefault("S3_ACCESS_KEY_ID", "test")
+os.environ.setdefault("S3_SECRET_ACCESS_KEY", "test")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  registers every table on Base
+import app.models.video  # noqa: F401
+from app.core.database import Base
+from app.models.message import Message
+from app.pipeline.context import SUMMARY_HEADER, ContextWindowManager, estimate_tokens
+
+CHAT_ID = 1
+
+
+def code_reply(name: str, prose: str = "Here is the animation.") -> str:
+    return f"{prose}\n```python\nfrom manim import *\nclass {name}(Scene):\n    def construct(self):\n        pass\n```"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'context.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_messages(db, *messages):
+    start = datetime(2026, 1, 1) + timedelta(minutes=db.query(Message).count())
+    for offset, (role, content) in enumerate(messages):
+        created = start + timedelta(seconds=offset)
+        db.add(Message(chat_id=CHAT_ID, role=role, content=content, created_at=created, updated_at=created))
+    db.commit()
+
+
+def history_text(session) -> str:
+    return "\n".join(message["content"] for message in session.history)
+
+
+def test_latest_code_survives_failed_turns(db):
+    manager = ContextWindowManager(token_budget=16000, recent_turns=2)
+    add_messages(db, ("user", "Draw a circle"), ("assistant", code_reply("FirstScene")))
+    add_messages(db, ("user", "Make it blue"), ("assistant", code_reply("BlueScene")))
+    # Failed generations only leave the user's request behind
+    add_messages(db, ("user", "Add a square"), ("user", "Animate the square"), ("user", "Add a label"))
+
+    text = history_text(manager.build_session(db, CHAT_ID))
+
+    assert "class BlueScene" in text
+    assert "class FirstScene" not in text
+    assert SUMMARY_HEADER in text
+
+    # Built again from the stored summary only, the code is still there
+    text = history_text(manager.build_session(db, CHAT_ID))
+    assert "class BlueScene" in text
+
+
+def test_newer_code_replaces_carried_code(db):
+    manager = ContextWindowManager(token_budget=16000, recent_turns=1)
+    add_messages(db, ("user", "Draw a circle"), ("assistant", code_reply("FirstScene")), ("user", "Add a square"))
+    manager.build_session(db, CHAT_ID)
+    add_messages(db, ("assistant", code_reply("SquareScene")), ("user", "Add a label"))
+
+    text = history_text(manager.build_session(db, CHAT_ID))
+
+    assert "class SquareScene" in text
+    assert "class FirstScene" not in text
+
+
+def test_budget_pressure_keeps_latest_code(db):
+    add_messages(db, ("user", "Draw a circle " * 100), ("assistant", code_reply("FirstScene")))
+    add_messages(db, ("user", "Make it blue " * 100), ("assistant", code_reply("LatestScene", "Some notes. " * 300)))
+    add_messages(db, ("user", "Now move it " * 100))
+    manager = ContextWindowManager(token_budget=0, recent_turns=3)
+    # Too small for anything but the latest code and a few trimmed lines
+    manager.token_budget = manager._preamble_tokens + 300
+
+    text = history_text(manager.build_session(db, CHAT_ID))
+
+    assert "class LatestScene(Scene):\n    def construct(self):\n        pass\n```" in text
+    assert "Some notes. " * 20 not in text
+    assert "Now move it" in text
@@ -0,0 +1,104 @@
+"""
+Tests for the warm render worker pool, driven through the subprocess backend.
+
+A stub `manim` package is placed in the scripts directory, which is the
+worker's working directory, so the real worker script and JSON protocol run
+without Manim installed. Run with: python -m pytest test_render_pool.py
+"""
+
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("LLM_API_KEY", "test")
+os.environ.setdefault("S3_ACCESS_KEY_ID", "test")
+os.environ.setdefault("S3_SECRET_ACCESS_KEY", "test")
+
+import pytest
+
+from app.service.render_pool import ManimRenderFailed, RenderWorkerPool, SubprocessRenderBackend
+
+STUB_MANIM_INIT = '''
+from contextlib import contextmanager
+
+@contextmanager
+def tempconfig(config):
+    yield
+'''
+
+STUB_MANIM_MAIN = '''
+class _Command:
+    # Stands in for manim's click command group
+    def main(self, args, standalone_mode=True):
+        if "BrokenScene" in args:
+            raise ValueError("construct() failed")
+        print("rendered " + " ".join(args))
+
+main = _Command()
+'''
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    (tmp_path / "manim").mkdir()
+    (tmp_path / "manim" / "__init__.py").write_text(STUB_MANIM_INIT)
+    (tmp_path / "manim" / "__main__.py").write_text(STUB_MANIM_MAIN)
+    pool = RenderWorkerPool(
+        backend=SubprocessRenderBackend(),
+        scripts_dir=tmp_path,
+        size=2,
+        max_jobs_per_worker=3,
+        health_check_interval=0.2,
+        startup_timeout=20,
+    )
+    pool.start()
+    wait_for(lambda: pool.stats()["idle"] == 2)
+    yield pool
+    pool.shutdown()
+
+
+def test_render_reuses_warm_worker(pool):
+    for _ in range(2):
+        pool.render(["-ql", "scene.py", "GoodScene"], timeout=20)
+
+    stats = pool.stats()
+    assert stats["jobs_rendered"] == 2
+    assert stats["workers_recycled"] == 0
+    assert stats["idle"] == pool.size
+
+
+def test_failed_render_keeps_worker(pool):
+    with pytest.raises(ManimRenderFailed) as excinfo:
+        pool.render(["-ql", "scene.py", "BrokenScene"], timeout=20)
+
+    assert "construct() failed" in str(excinfo.value)
+    assert pool.stats()["workers_recycled"] == 0
+
+
+def test_worker_recycled_after_max_jobs(pool):
+    for _ in range(pool.max_jobs_per_worker * pool.size):
+        pool.render(["-ql", "scene.py", "GoodScene"], timeout=20)
+
+    assert pool.stats()["workers_recycled"] >= 1
+    wait_for(lambda: pool.stats()["workers"] == pool.size)
+
+
+def test_health_check_replaces_dead_worker(pool):
+    worker = next(iter(pool._workers))
+    worker._process.kill()
+    worker._process.wait()
+
+    # The background health check notices the dead worker without any render
+    wait_for(lambda: pool.stats()["workers_recycled"] == 1)
+    wait_for(lambda: pool.stats()["idle"] == pool.size)
+    assert worker not in pool._workers
+    pool.render(["-ql", "scene.py", "GoodScene"], timeout=20)
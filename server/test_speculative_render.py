@@ -0,0 +1,96 @@
+"""
+Tests for racing speculative code candidates in the generation pipeline.
+
+Rendering, S3 and the database are replaced with stubs, so only the race and
+its bookkeeping run. Run with: python -m pytest test_speculative_render.py
+"""
+
+import asyncio
+import os
+import types
+from contextlib import contextmanager
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("LLM_API_KEY", "test")
+os.environ.setdefault("S3_ACCESS_KEY_ID", "test")
+os.environ.setdefault("S3_SECRET_ACCESS_KEY", "test")
+
+import pytest
+
+from app.pipeline import generation
+from app.pipeline.llm import PromptSession, llm_service
+from app.pipeline.llm_cache import LLMResponseCache, MemoryResponseStore
+from app.service.manim import ManimGenerationError
+
+PROMPT = "Draw a circle"
+
+
+def candidate(name: str) -> str:
+    return f"```python\nfrom manim import *\nclass {name}(Scene):\n    def construct(self):\n        pass\n```"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    @contextmanager
+    def generate_video(code, **kwargs):
+        if "Broken" in code:
+            raise ManimGenerationError("construct() failed")
+        yield types.SimpleNamespace(path="/tmp/video.mp4", duration=2.0)
+
+    monkeypatch.setattr(generation.manim_service, "generate_video", generate_video)
+    monkeypatch.setattr(
+        generation.s3_upload_service, "upload_video_file",
+        lambda path, username, chat_id: f"https://bucket.s3.amazonaws.com/{username}/{chat_id}/video.mp4",
+    )
+    monkeypatch.setattr(generation, "render_cache", None)
+    monkeypatch.setattr(generation, "source_video_cache", None)
+    monkeypatch.setattr(generation, "PROGRESSIVE_RENDER", False)
+    monkeypatch.setattr(generation, "_save_generation", lambda code, chat_id, s3_url, duration: code)
+
+    cache = LLMResponseCache(MemoryResponseStore(max_entries=16, ttl_seconds=None))
+    monkeypatch.setattr(llm_service, "response_cache", cache)
+    return cache
+
+
+def cached_session(cache: LLMResponseCache, reply: str) -> PromptSession:
+    # The primary candidate as generate_manim_code leaves it: answered from the cache
+    session = PromptSession()
+    session.add_prompt(PROMPT)
+    session.cache_key = cache.put(llm_service.model, 0.3, session.get_preamble(), session.history, reply)
+    return session
+
+
+def cache_lookup(cache: LLMResponseCache, session: PromptSession):
+    return cache.lookup(llm_service.model, 0.3, session.get_preamble(), session.history)
+
+
+def generate(primary: str, extras, session: PromptSession) -> str:
+    return asyncio.run(generation.generate_video_with_retry(
+        code=primary,
+        original_content=PROMPT,
+        prompt_session=session,
+        chat_id=1,
+        username="alice",
+        candidates=extras,
+    ))
+
+
+def test_extra_candidate_wins_when_first_fails(pipeline):
+    session = cached_session(pipeline, candidate("BrokenScene"))
+
+    saved = generate(candidate("BrokenScene"), [candidate("WorkingScene")], session)
+
+    assert "WorkingScene" in saved
+    # The reply that failed to render must not be served for the same prompt again
+    assert cache_lookup(pipeline, session) is None
+    assert session.cache_key is None
+
+
+def test_cached_reply_kept_when_first_candidate_wins(pipeline):
+    session = cached_session(pipeline, candidate("FirstScene"))
+
+    saved = generate(candidate("FirstScene"), [candidate("BrokenScene")], session)
+
+    assert "FirstScene" in saved
+    assert cache_lookup(pipeline, session) is not None